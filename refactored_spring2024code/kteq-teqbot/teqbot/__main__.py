@@ -1,99 +1,131 @@
+import argparse
 import sys
 from slackclient import SlackClient
 import os
 from teq import TeqBot
 
-NOW_PLAYING   = '00000001'
-STREAM_STATUS = '00000010'
-CHECK_LYRICS  = '00000100'
-SWEAR_LOG     = '00001000'
-OPTION_5      = '00010000'
-OPTION_6      = '00100000'
-OPTION_7      = '01000000'
-UPDATE_REPO   = '10000000'
+NOW_PLAYING   = 1 << 0
+STREAM_STATUS = 1 << 1
+CHECK_LYRICS  = 1 << 2
+SWEAR_LOG     = 1 << 3
+OPTION_5      = 1 << 4
+OPTION_6      = 1 << 5
+OPTION_7      = 1 << 6
+UPDATE_REPO   = 1 << 7
+
+#command line flags mapped to their scheduler event bit. the first
+#entry doubles as the argparse destination name.
+FLAG_MAP = [ ( "nowplaying", "-n", NOW_PLAYING   ),
+             ( "status",     "-s", STREAM_STATUS ),
+             ( "lyric",      "-l", CHECK_LYRICS  ),
+             ( "swear",      "-w", SWEAR_LOG     ),
+             ( "update",     "-u", UPDATE_REPO   ) ]
+
+def build_parser():
+    'build the argparse parser with one subparser per teqbot command'
+    parser = argparse.ArgumentParser(prog='teqbot', add_help=False)
+    sub    = parser.add_subparsers(dest='cmd')
+
+    sub.add_parser('usage', add_help=False)
+    sub.add_parser('kill',  add_help=False)
+
+    # scheduler and task take the same task-selection flags
+    for cmd in ('scheduler', 'task'):
+        p = sub.add_parser(cmd, add_help=False)
+        for name, short, bit in FLAG_MAP:
+            p.add_argument(short, "--" + name, action='store_true')
+        if cmd == 'scheduler':
+            # spawn each task as its own interpreter, the old way
+            p.add_argument("--legacy-subprocess", action='store_true')
+
+    message = sub.add_parser('message', add_help=False)
+    message.add_argument('text', nargs='*')
+
+    return parser
+
+#usage statement, folded into a single constant at compile time so
+#printing it allocates nothing
+USAGE = (
+    "\n\n"
+    "===============\n"
+    "KTEQ-FM TEQ-BOT\n"
+    "===============\n\n"
+    "=======================================\n"
+    "By J. Anthony Brackins & Jonathan Dixon\n"
+    "=======================================\n\n"
+    "Requirements:\n"
+    "Python3\n"
+    "slackclient python library\n"
+    "BeautifulSoup python library\n"
+    "Slack API Token\n\n"
+    "Usage:\n"
+    "python3 teqbot <command> [options]\n\n"
+    "Commands:\n\n"
+    "\tusage             \t\tPrint Usage statement\n"
+    "\tscheduler         \t\tRun the scheduler that handles calling each task\n"
+    "\ttask              \t\tRun an individual scheduler task\n"
+    "Scheduler Options:\n\n"
+    "\t-n, --nowplaying  \t\tStart Up Nowplaying messages to slack\n"
+    "\t-s, --status      \t\tCheck the status of the stream\n"
+    "\t-l, --lyric       \t\tUpdate Lyrics being output to song logger\n"
+    "\t-w, --swear       \t\tSend Swear Logs to slack\n"
+    "Test Commands:\n\n"
+    "\tkill          \t\tSend a message to stop the scheduler\n"
+    "\tmessage <text>\t\tSend a test message to #boondoggling channel\n"
+    "\n" )
 
 def usage():
-    usage = "\n\n"
-    usage = usage + "===============\n"
-    usage = usage + "KTEQ-FM TEQ-BOT\n"
-    usage = usage + "===============\n\n"
-    usage = usage + "=======================================\n"
-    usage = usage + "By J. Anthony Brackins & Jonathan Dixon\n"
-    usage = usage + "=======================================\n\n"
-    usage = usage + "Requirements:\n"
-    usage = usage + "Python3\n"
-    usage = usage + "slackclient python library\n"
-    usage = usage + "BeautifulSoup python library\n"
-    usage = usage + "Slack API Token\n\n"
-    usage = usage + "Usage:\n"
-    usage = usage + "python3 teqbot <command> [options]\n\n"
-    usage = usage + "Commands:\n\n"
-    usage = usage + "\tusage             \t\tPrint Usage statement\n"
-    usage = usage + "\tscheduler         \t\tRun the scheduler that handles calling each task\n"
-    usage = usage + "\ttask              \t\tRun an individual scheduler task\n"
-
-    usage = usage + "Scheduler Options:\n\n"
-    usage = usage + "\t-n, --nowplaying  \t\tStart Up Nowplaying messages to slack\n"
-    usage = usage + "\t-s, --status      \t\tCheck the status of the stream\n"
-    usage = usage + "\t-l, --lyric       \t\tUpdate Lyrics being output to song logger\n"
-    usage = usage + "\t-w, --swear       \t\tSend Swear Logs to slack\n"
-
-    usage = usage + "Test Commands:\n\n"
-    usage = usage + "\tkill          \t\tSend a message to stop the scheduler\n"
-    usage = usage + "\tmessage <text>\t\tSend a test message to #boondoggling channel\n"
-
-    return usage + "\n"
-
-def command_handler(args):
-    'check what command line argument was handled'
-    args[0] = args[0].upper()
-    #handle MESSAGE command:
-    if "USAGE" in args:
+    return USAGE
+
+def command_handler(args, teq):
+    'parse the command line and dispatch the requested command'
+    parser = build_parser()
+    try:
+        # commands used to be accepted in any case
+        opts = parser.parse_args( [ args[0].lower() ] + args[1:] )
+    except SystemExit:
+        print( usage() )
+        return
+
+    if opts.cmd == 'usage' or opts.cmd is None:
         # Print Usage Statement
         print( usage() )
-    elif "MESSAGE" in args:
-        indx = args.index("MESSAGE")
-        if len(args) > 1:
+    elif opts.cmd == 'message':
+        if opts.text:
             # Send whatever message you enter as command line args
-            msg = " ".join(args[indx+1:])
+            msg = " ".join(opts.text)
             print( "Sending \'" + msg + "\' to #boondoggling channel..." )
-            #print( test_slack_message( msg ) )
-    elif "SCHEDULER" in args:
+            #print( test_slack_message( teq, msg ) )
+    elif opts.cmd == 'scheduler':
         #reset stat file
         teq.delete_stat_file()
 
         # Set up all events to handle using BITWISE ops
-        event = '00000000'
-
-        if  "--nowplaying" in args or "-n" in args:
-            event = "{0:b}".format( int( event, 2) | int(NOW_PLAYING, 2) )
-        if "--status" in args or "-s" in args:
-            event = "{0:b}".format( int( event, 2) | int(STREAM_STATUS, 2) )
-        if "--lyric" in args or "-l" in args:
-            event = "{0:b}".format( int( event, 2) | int(CHECK_LYRICS, 2) )
-        if "--swear" in args or "-w" in args:
-            event = "{0:b}".format( int( event, 2) | int(SWEAR_LOG, 2) )
-        if "--update" in args or "-u" in args:
-            event = "{0:b}".format( int( event, 2) | int(UPDATE_REPO, 2) )
-        teq.scheduler(event)
-    elif "TASK" in args:
+        event = 0
+
+        for name, short, bit in FLAG_MAP:
+            if getattr(opts, name):
+                event |= bit
+
+        # the scheduler takes its events as a bitmask
+        teq.scheduler( event, subprocess_tasks=opts.legacy_subprocess )
+    elif opts.cmd == 'task':
         # ONLY run one individual task ONCE
-        if  "--nowplaying" in args or "-n" in args:
-            teq.task_now_playing()
-        elif "--status" in args or "-s" in args:
-            teq.task_stream_status()
-        elif "--lyric" in args or "-l" in args:
-            teq.task_check_lyrics()
-        elif "--swear" in args or "-w" in args:
-            teq.task_swear_log()
-        elif "--update" in args or "-u" in args:
-            teq.task_update_repo()
-    elif "KILL" in args:
+        tasks = { 'nowplaying' : teq.task_now_playing,
+                  'status'     : teq.task_stream_status,
+                  'lyric'      : teq.task_check_lyrics,
+                  'swear'      : teq.task_swear_log,
+                  'update'     : teq.task_update_repo }
+        for name, task in tasks.items():
+            if getattr(opts, name):
+                task()
+                break
+    elif opts.cmd == 'kill':
         print("Halting Scheduler running on different process...")
         teq.set_stat_file("Done")
 
 #simply prints some channel info, then sends message to #boondoggling
-def test_slack_message(message="Hello World!"):
+def test_slack_message(teq, message="Hello World!"):
     channels = teq.get_channels()
     if channels:
         for channel in channels:
@@ -106,10 +138,20 @@ def test_slack_message(message="Hello World!"):
     else:
         return "Unable to authenticate."
 
-# get system arguments
-teq = TeqBot()
-args = sys.argv
-if len(args) > 1:
-    command_handler( args[1:] )
-else:
-    print( usage() )
+def main():
+    'read system arguments and dispatch, building a TeqBot if needed'
+    args = sys.argv[1:]
+    # the usage statement doesn't need a TeqBot at all, so skip the
+    # constructor (env reads, slack client setup) for those calls
+    if not args or args[0].lower() == 'usage':
+        print( usage() )
+        return
+    try:
+        teq = TeqBot()
+    except RuntimeError as err:
+        # missing environment variables; the message names them
+        raise SystemExit(err)
+    command_handler( args, teq )
+
+if __name__ == "__main__":
+    main()
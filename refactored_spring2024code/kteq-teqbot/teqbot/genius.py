@@ -34,16 +34,178 @@ Todo:
 import sys
 import requests
 import os
+import sqlite3
+import time
+import threading
+import unicodedata
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 from nltk.stem.lancaster import LancasterStemmer
 from difflib import SequenceMatcher
 
+#rapidfuzz is a C++ implementation of fuzzy string matching that is
+#much faster than difflib. fall back to difflib if it isn't installed.
+try:
+    from rapidfuzz import fuzz as _fuzz
+except ImportError:
+    _fuzz = None
+
+#selectolax wraps a C html parser and is an order of magnitude
+#faster than BeautifulSoup on the genius lyric pages. failing that,
+#let BeautifulSoup use lxml's C parser when it is installed.
+try:
+    from selectolax.parser import HTMLParser as _HTMLParser
+except ImportError:
+    _HTMLParser = None
+try:
+    import lxml
+    _BS_PARSER = "lxml"
+except ImportError:
+    _BS_PARSER = "html.parser"
+
+#marisa-trie can persist the profanity set to disk and mmap it back
+#in, which suits the short-lived task processes cron spawns. the
+#frozenset path below remains the fallback.
+try:
+    import marisa_trie
+except ImportError:
+    marisa_trie = None
+
 GENIUS_URL = "https://api.genius.com"
 
+#shared HTTP session for every request this module makes. reusing one
+#session keeps connections (and their TLS handshakes) alive between
+#calls instead of opening a fresh connection per request, and retries
+#transient failures with a short backoff.
+_SESSION = requests.Session()
+_ADAPTER = requests.adapters.HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    max_retries=requests.adapters.Retry(total=3, backoff_factor=0.3) )
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+
 SONG_HAS_SWEARS = 0
 SONG_SWEAR_FREE = 1
 SONG_NOT_FOUND  = 2
 
+#shared stemmer instance. constructing a LancasterStemmer is not free,
+#so build one at module load rather than once per song. the stem
+#lookups are memoized since lyrics repeat the same words constantly
+#(choruses, hooks), which skips the suffix-rule work for repeats.
+_STEMMER = LancasterStemmer()
+_stem = lru_cache(maxsize=4096)(_STEMMER.stem)
+
+#translation table that strips lyric punctuation in one C pass
+_PUNCT_TABLE = str.maketrans('', '', '!,.?')
+
+#hidden file storing cached genius lookups
+CACHE_FILE = '.teq.lyrics.db'
+
+def normalize_key(s):
+    """Normalize an artist or song name for cache lookups.
+
+    Reduces a string to a canonical form so that slight variations
+    in metadata (casing, stray whitespace, unicode composition) all
+    map to the same cache entry.
+
+    Args:
+        s (str): artist or song name
+
+    Returns:
+            (str): normalized string
+    """
+    return unicodedata.normalize('NFKD', s).lower().strip()
+
+class _LyricsCache:
+    """Persistent cache for Genius api paths and song lyrics.
+
+    Songs on KTEQ tend to be looked up repeatedly: a long track is
+    still playing the next time the scheduler fires, and DJs often
+    replay songs across a set. This cache stores the api path and
+    lyrics for each (artist, song) pair in a small sqlite database
+    so that repeat lookups skip the Genius round-trips entirely.
+
+    Attributes:
+        conn (sqlite3.Connection): connection to the cache database
+        lock (threading.Lock): serializes access to the connection
+
+    """
+
+    def __init__(self, filename=CACHE_FILE):
+        """Open (or create) the cache database file.
+
+        The scheduler runs lyric tasks on a thread pool, so this
+        connection is used from whichever worker thread a task lands
+        on; check_same_thread is disabled and a lock serializes the
+        queries instead.
+        """
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS lyrics ("
+            " norm_artist TEXT,"
+            " norm_title  TEXT,"
+            " api_path    TEXT,"
+            " lyrics      TEXT,"
+            " fetched_at  INTEGER,"
+            " PRIMARY KEY(norm_artist, norm_title) )"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_lyrics_key"
+            " ON lyrics (norm_artist, norm_title)"
+        )
+        self.conn.commit()
+
+    def lookup(self, artist, title):
+        """Look up a cached (api_path, lyrics) pair for a song.
+
+        Args:
+            artist (str): song artist
+            title  (str): song name
+
+        Returns:
+                (tuple): (api_path, lyrics) if cached, None otherwise
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT api_path, lyrics FROM lyrics"
+                " WHERE norm_artist = ? AND norm_title = ?",
+                (normalize_key(artist), normalize_key(title))
+            ).fetchone()
+        return row
+
+    def store(self, artist, title, api_path, lyrics):
+        """Store a fetched (api_path, lyrics) pair for a song.
+
+        Args:
+            artist   (str): song artist
+            title    (str): song name
+            api_path (str): path to song API
+            lyrics   (str): song lyrics
+        """
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO lyrics VALUES (?, ?, ?, ?, ?)",
+                (normalize_key(artist), normalize_key(title),
+                 api_path, lyrics, int(time.time()))
+            )
+            self.conn.commit()
+
+_CACHE = None
+
+def get_cache():
+    """Return the shared lyrics cache, creating it on first use.
+
+    Returns:
+            (_LyricsCache): shared cache instance
+    """
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = _LyricsCache()
+    return _CACHE
+
 def load_auth(token=None):
     """Convert Genius Token into required format.
 
@@ -68,6 +230,11 @@ def similarity(a, b):
     to one another. This will allow for imprecise queries for song artists and
     song names, such as mispellings or other slight differences.
 
+    Uses rapidfuzz when available, which computes the same ratio in
+    native code; every hit in a genius search response goes through
+    this function, so the difference adds up. Otherwise falls back
+    to difflib's SequenceMatcher.
+
     Args:
         a (str): string being compared to b
         b (str): string being compared to a
@@ -87,6 +254,8 @@ def similarity(a, b):
         >>> genius.similarity("Kendrick Lamar","Kendrick")
         0.7272727272727273
     """
+    if _fuzz is not None:
+        return _fuzz.ratio(a, b) / 100.0
     return SequenceMatcher(None, a, b).ratio()
 
 def load_profanity(filename):
@@ -96,14 +265,50 @@ def load_profanity(filename):
     A more robust profanity filter can be built by adding words to the file
     loaded, or by using different/multiple files.
 
+    The words are returned as a frozenset so that membership checks in
+    the profanity tests are constant time instead of a scan of the
+    whole list for every word in the lyrics. When marisa-trie is
+    installed the set is instead persisted next to the source file
+    and mmapped back in, so the short-lived task processes skip
+    rebuilding it on every startup.
+
     Args:
         filename (str): file containing swear words, one per line
 
     Returns:
-            (list): list containing swear words
+            (frozenset): set containing swear words (a marisa trie
+            with the same membership interface when available)
     """
+    if marisa_trie is not None:
+        return _ensure_trie(filename)
     with open(filename) as f:
-        return [ word.strip() for word in f.readlines() ]
+        return frozenset( word.strip() for word in f.readlines() )
+
+def _ensure_trie(filename):
+    """Load the profanity words as a disk-persisted marisa trie.
+
+    Keeps a compiled trie alongside the source word list. When the
+    compiled copy is at least as new as the source it is mmapped
+    straight in; otherwise the trie is rebuilt from the words and
+    saved for the next process.
+
+    Args:
+        filename (str): file containing swear words, one per line
+
+    Returns:
+            (marisa_trie.Trie): trie containing swear words
+    """
+    compiled = filename + '.marisa'
+    if os.path.exists(compiled) and \
+       os.path.getmtime(compiled) >= os.path.getmtime(filename):
+        trie = marisa_trie.Trie()
+        trie.mmap(compiled)
+        return trie
+    with open(filename) as f:
+        words = [ word.strip() for word in f.readlines() ]
+    trie = marisa_trie.Trie(words)
+    trie.save(compiled)
+    return trie
 
 def clean_test_01(lyrics, bad_words=None):
     """Check if lyrics are clean (TEST #1).
@@ -123,7 +328,7 @@ def clean_test_01(lyrics, bad_words=None):
 
     Args:
         lyrics     (str): song lyrics
-        bad_words (list): list of bad words (ignored for this test)
+        bad_words (frozenset): set of bad words (ignored for this test)
 
     Returns:
             (int): value indicating:
@@ -139,19 +344,27 @@ def clean_test_01(lyrics, bad_words=None):
     params = {'q': lyrics}
 
     # GET request, using the lyrics of song
-    response = requests.get(url, params=params)
+    try:
+        response = _SESSION.get(url, params=params, timeout=5)
+    except requests.exceptions.RequestException:
+        # server unreachable or request timed out
+        return [SONG_NOT_FOUND, [] ]
+
+    # the response body is a tiny 'true'/'false' literal; compare the
+    # raw bytes directly rather than decoding and scanning the text
+    body = response.content.strip().lower()
 
     test = None
     # Determine if song is clean, has swears, or other
-    if 'true' in response.text :
+    if body == b'true' :
         test =  SONG_HAS_SWEARS
-    elif 'false' in response.text :
+    elif body == b'false' :
         test =  SONG_SWEAR_FREE
     else :
         test =  SONG_NOT_FOUND
     return [test, [] ]
 
-def clean_test_02(lyrics, bad_words):
+def clean_test_02(lyrics, bad_words, cleaned=None, stop_on_first=False):
     """Check if lyrics are clean (TEST #2).
 
     given a string containing the song lyrics, determines if the song contains
@@ -171,7 +384,14 @@ def clean_test_02(lyrics, bad_words):
 
     Args:
         lyrics     (str): song lyrics
-        bad_words (list): list of bad words
+        bad_words (frozenset): set of bad words
+        cleaned    (str): optional pre-normalized lyrics (punctuation
+                    stripped, lowercased). callers that have already
+                    normalized the lyrics can pass it to skip the
+                    extra pass here.
+        stop_on_first (bool): stop scanning at the first swear found.
+                    callers that only care whether the song is clean
+                    can set this to skip the rest of the lyrics.
 
     Returns:
             (int): value indicating:
@@ -182,15 +402,21 @@ def clean_test_02(lyrics, bad_words):
             (list): list containing swear words in order of appearance in the
                     song, based on lyrics provided.
     """
-    tokens = lyrics.split()
+    # strip punctuation and lowercase the whole song in one pass,
+    # instead of calling strip() and lower() on every token
+    if cleaned is None:
+        cleaned = lyrics.translate(_PUNCT_TABLE).lower()
+
+    tokens = cleaned.split()
     bad_found = []
-    st = LancasterStemmer()
 
     test = None
-    for word in tokens:
-        w = word.strip('!,.?').lower()
-        if st.stem(w) in bad_words:
+    for w in tokens:
+        if _stem(w) in bad_words:
             bad_found.append(w)
+            if stop_on_first:
+                # caller only wants the verdict, not the full list
+                return [SONG_HAS_SWEARS, bad_found ]
     if len(bad_found) > 0:
         test = SONG_HAS_SWEARS
     else:
@@ -214,41 +440,64 @@ def get_lyrics(auth, api_path):
     url = GENIUS_URL + api_path
 
     # GET request
-    response = requests.get(url, headers=auth)
+    response = _SESSION.get(url, headers=auth)
 
     # Get json version
     json = response.json()
     path = json["response"]["song"]["path"]
 
-    # Scrape using soup
+    # Scrape the lyric page
     url = "http://genius.com" + path
-    lyric_page = requests.get(url)
-    html = BeautifulSoup(lyric_page.text, "html.parser")
+    lyric_page = _SESSION.get(url)
+
+    if _HTMLParser is not None:
+        # selectolax: parse, drop scripts, and pull the lyrics div
+        # in one pass through the C parser's tree
+        tree = _HTMLParser(lyric_page.text)
+        for h in tree.css('script'):
+            h.decompose()
+        lyrics = tree.css_first('div.lyrics').text()
+    else:
+        html = BeautifulSoup(lyric_page.text, _BS_PARSER)
 
-    # Clean script tags
-    [h.extract() for h in html('script')]
+        # Clean script tags
+        [h.extract() for h in html('script')]
 
-    # Return lyrics, these are tagged nicely in Genius
-    lyrics = html.find("div", class_="lyrics").get_text()
+        # Return lyrics, these are tagged nicely in Genius
+        lyrics = html.find("div", class_="lyrics").get_text()
     return lyrics
 
-def run_tests(lyrics,bad_words):
+def run_tests(lyrics,bad_words,stop_on_first=False):
     """Run all existing profanity tests and return results.
 
+    The tests are independent of one another, and the first test is
+    dominated by waiting on an HTTP response, so all tests are run
+    concurrently in a thread pool. The lyrics are normalized once
+    here and shared with every test that wants the normalized form,
+    rather than each test making its own pass over the string.
+    Results are returned in test order.
+
     Args:
         lyrics      (str): Song Lyrics
         bad_words   (str): loaded in list of bad words
+        stop_on_first (bool): stop at the first swear found. only set
+                    this when the caller doesn't use the swear list
+                    in its report.
     Returns:
             (list): list containing reports from each test
     """
 
-    # Add new clean tests here
-    test_list = [ clean_test_01,
-                  clean_test_02 ]
+    # normalize once, up front, for any test that needs it
+    cleaned = lyrics.translate(_PUNCT_TABLE).lower()
 
-    res = []
-    for test in test_list:
-        res.append( test(lyrics,bad_words)  )
+    # run every test at once; the local tests finish while the
+    # network-bound test is still waiting on its response.
+    # Add new clean tests here
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [ pool.submit(clean_test_01, lyrics, bad_words),
+                    pool.submit(clean_test_02, lyrics, bad_words,
+                                cleaned, stop_on_first) ]
+        res     = [ f.result() for f in futures ]
 
     return res
 
@@ -263,22 +512,28 @@ def evaluate_tests(results):
     Returns:
             (str): Generated report
     """
-    i = 1
-    msg = ""
-    swears = ""
-    code   = ""
-    for test in results:
-        code = test_code(test[0],i)
-        if test[0] == SONG_HAS_SWEARS:
-            if i > 1:
-                swears = " Song Contains: " + ", ".join(test[1])
-            else:
-                swears = " Song May Contain Swears, Check other Tests"
-        #print(code)
-        msg += code + swears + "\n"
-        i += 1
+    if not results:
+        return ""
+    return "\n".join( _format_test(i, test)
+                      for i, test in enumerate(results, 1) ) + "\n"
 
-    return msg
+def _format_test(number, test):
+    """Format one test result into its report line.
+
+    Args:
+        number (int): Test Number
+        test  (list): [code, swears] result pair from one test
+
+    Returns:
+            (str): report line for the given test
+    """
+    swears = ""
+    if test[0] == SONG_HAS_SWEARS:
+        if number > 1:
+            swears = " Song Contains: " + ", ".join(test[1])
+        else:
+            swears = " Song May Contain Swears, Check other Tests"
+    return test_code(test[0], number) + swears
 
 def test_code(code, number):
     """Convert each test code into a readable message.
@@ -349,7 +604,7 @@ def get_api_path(auth, song_title, song_artist):
 
     # First search: Search by song title
     data = {'q': song_title}
-    response = requests.get(url, data=data, headers=auth)
+    response = _SESSION.get(url, data=data, headers=auth)
 
     # Get JSON Data
     json = response.json()
@@ -371,7 +626,7 @@ def get_api_path(auth, song_title, song_artist):
     else:
         # Second search: Reversed, search by artist
         data = {'q': song_artist}
-        response = requests.get(url, data=data, headers=auth)
+        response = _SESSION.get(url, data=data, headers=auth)
         json = response.json()
         info = None
 
@@ -400,11 +655,18 @@ def run(song,artist,bad_words,auth):
             (str)    : Report containing found swears, and lyrics
             (boolean): True if runs without finding swears, False if swears found
     """
-    api_path = get_api_path(auth, song, artist)
+    # consult the cache before making any genius requests
+    cached = get_cache().lookup(artist, song)
+    if cached is not None:
+        api_path, lyrics = cached
+    else:
+        api_path = get_api_path(auth, song, artist)
+        lyrics = ""
     report = ""
-    lyrics = ""
     if api_path is not None:
-        lyrics = get_lyrics(auth, api_path)
+        if cached is None:
+            lyrics = get_lyrics(auth, api_path)
+            get_cache().store(artist, song, api_path, lyrics)
         result = run_tests(lyrics, bad_words)
         report = generate_report(song,artist,lyrics,result)
     else:
@@ -28,8 +28,21 @@ Todo:
 import sys
 import json
 
+#orjson parses and serializes json several times faster than the
+#stdlib and works directly on bytes, skipping the text decode step.
+#stdlib json remains the fallback.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 LOG_SWEAR = 1
 
+#every field a swear log entry must contain
+_SWEAR_FIELDS = frozenset([ "date", "time", "song title",
+                            "song artist", "song composer",
+                            "show name", "report" ])
+
 def compare_json(json1,json2):
     """Compare Two JSON data structs to check if they're identical.
 
@@ -40,24 +53,9 @@ def compare_json(json1,json2):
     Returns:
         (boolean): True if identical, False if not
     """
-    # Iterate Through First
-    for key, value in json1.items():
-        if key not in json2:
-            return False
-        else:
-            if value != json2[key]:
-                return False
-
-    # Iterate Through Last
-    for key, value in json2.items():
-        if key not in json1:
-            return False
-        else:
-            if value != json1[key]:
-                return False
-
-    # Must be identical
-    return True
+    # dict equality recurses through nested values in C and
+    # short-circuits on size mismatches
+    return json1 == json2
 
 def read_json(filename):
     """Read JSON file and store to a variable.
@@ -73,6 +71,9 @@ def read_json(filename):
         >>> import log
         >>> data = log.read_json("test.json")
     """
+    if orjson is not None:
+        with open(filename, 'rb') as j:
+            return orjson.loads(j.read())
     with open(filename) as j:
         return json.load(j)
 
@@ -92,6 +93,10 @@ def write_json(data, filename):
         >>> d = { "Coolness Factor": 0 }
         >>> data = log.write_json(d,"test.json")
     """
+    if orjson is not None:
+        with open(filename, 'wb') as j:
+            j.write(orjson.dumps(data))
+        return
     with open(filename, 'w') as j:
         json.dump(data, j)
 
@@ -105,16 +110,9 @@ def validate(data,log_type):
         (boolean): True if valid, False otherwise.
 
     """
-
-    if log_type is LOG_SWEAR:
-        fields = ["date", "time", "song title",
-                  "song artist", "song composer",
-                  "show name", "report"]
-        for f in fields:
-            if f not in data:
-                return False
-            return True
-    return False
+    # one set operation covers every required field. the old loop
+    # returned after inspecting only the first field.
+    return log_type is LOG_SWEAR and _SWEAR_FIELDS.issubset(data)
 
 def generate_swear_log(data):
     """Generate Swear Log from JSON data
@@ -125,22 +123,19 @@ def generate_swear_log(data):
         msg (str): Swear Log.
 
     """
-    msg = ""
-
-    if validate(data, LOG_SWEAR):
-        msg += "```\n"
-        msg += "SWEAR LOG SUBMISSION FROM " + data['show name'] + ":\n\n"
-        msg += "Date         \t" + data['date']           + "\n"
-        msg += "Time         \t" + data['time']           + "\n"
-        msg += "Song     Name\t" + data['song title']     + "\n"
-        msg += "Song   Artist\t" + data['song artist']    + "\n"
-        msg += "Song Composer\t" + data['song composer']  + "\n"
-        msg += "\n\n"
-
-        msg += "Report:    \t" + data['report']
-        msg += "```"
-
-    return msg
+    if not validate(data, LOG_SWEAR):
+        return ""
+
+    # one f-string, one allocation
+    return ( f"```\n"
+             f"SWEAR LOG SUBMISSION FROM {data['show name']}:\n\n"
+             f"Date         \t{data['date']}\n"
+             f"Time         \t{data['time']}\n"
+             f"Song     Name\t{data['song title']}\n"
+             f"Song   Artist\t{data['song artist']}\n"
+             f"Song Composer\t{data['song composer']}\n"
+             f"\n\n"
+             f"Report:    \t{data['report']}```" )
 
 def usage():
     """Print Usage Statement.
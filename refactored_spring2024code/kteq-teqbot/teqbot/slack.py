@@ -44,8 +44,160 @@ Todo:
 
 import os
 import sys
+import time
+import queue
+import threading
 from slackclient import SlackClient
 
+#minimum spacing between chat.postMessage calls. slack allows roughly
+#one message per second per channel before throttling kicks in.
+SEND_INTERVAL = 1.0
+
+#how long (in seconds) a cached channel listing stays fresh
+CHANNEL_CACHE_TTL = 300
+
+#cached result of the channels.list API call, along with lookup
+#tables keyed by channel name and channel id. channels.list is
+#rate limited and slow, and the channel list rarely changes, so
+#one call serves every lookup for the next CHANNEL_CACHE_TTL seconds.
+_CHANNEL_CACHE = { 'ts': 0, 'channels': None, 'by_name': {}, 'by_id': {} }
+
+def _channel_cache(client):
+    """Return the channel cache, refreshing it when stale.
+
+    Performs the channels.list API call at most once every
+    CHANNEL_CACHE_TTL seconds and rebuilds the by-name and by-id
+    lookup tables in the same pass. Every other channel helper in
+    this module reads from the cache instead of hitting the API.
+
+    Args:
+        client (slackclient._client.SlackClient): SlackClient object
+            created by an API token.
+
+    Returns:
+        dict: cache record with 'channels', 'by_name', and 'by_id'
+    """
+    now = time.time()
+    if _CHANNEL_CACHE['channels'] is None or now - _CHANNEL_CACHE['ts'] > CHANNEL_CACHE_TTL:
+        channels_call = client.api_call("channels.list")
+        if channels_call.get('ok'):
+            channels = channels_call['channels']
+            _CHANNEL_CACHE['channels'] = channels
+            _CHANNEL_CACHE['by_name']  = { c['name'] : c for c in channels }
+            _CHANNEL_CACHE['by_id']    = { c['id']   : c for c in channels }
+            _CHANNEL_CACHE['ts']       = now
+    return _CHANNEL_CACHE
+
+class _MsgQueue:
+    """Background queue that batches and throttles slack messages.
+
+    chat.postMessage calls were previously made synchronously, one
+    API round-trip per message, which stalls the caller and trips
+    slack's per-channel rate limit during bursts. Messages are now
+    dropped onto this queue and sent by a background thread, which
+    coalesces consecutive messages bound for the same channel (with
+    the same username and emoji) into a single newline-joined post
+    and spaces sends SEND_INTERVAL seconds apart.
+
+    Attributes:
+        queue (queue.Queue): pending messages awaiting delivery
+        thread (threading.Thread): background delivery thread
+
+    """
+
+    def __init__(self):
+        self.queue  = queue.Queue()
+        self.thread = None
+
+    def put(self, client, channel_id, message, username, emoji):
+        """Enqueue a message for delivery, starting the worker if needed.
+
+        Args:
+            client (slackclient._client.SlackClient): SlackClient object
+            channel_id (str): Slack Channel ID
+            message (str): message being sent to the slack channel
+            username (str): username alias for message being sent
+            emoji (str): emoji used for user icon
+        """
+        self.queue.put( (client, channel_id, message, username, emoji) )
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._worker, daemon=True)
+            self.thread.start()
+
+    def flush(self):
+        """Block until every queued message has been delivered."""
+        self.queue.join()
+
+    def _worker(self):
+        """Deliver queued messages, batching and rate limiting sends.
+
+        A failed send is logged and dropped rather than allowed to
+        kill the worker: every item pulled off the queue is marked
+        done in a finally block, so flush() can never deadlock on a
+        batch whose delivery raised mid-way.
+        """
+        last_send = 0.0
+        while True:
+            # block for the next message, then drain whatever else
+            # has accumulated behind it
+            batch = [ self.queue.get() ]
+            try:
+                while True:
+                    batch.append( self.queue.get_nowait() )
+            except queue.Empty:
+                pass
+
+            try:
+                i = 0
+                while i < len(batch):
+                    # group consecutive messages sharing the same
+                    # destination, username, and emoji
+                    client, channel_id, text, username, emoji = batch[i]
+                    j = i + 1
+                    while j < len(batch) and \
+                          batch[j][0] is client and \
+                          batch[j][1] == channel_id and \
+                          batch[j][3] == username and \
+                          batch[j][4] == emoji:
+                        j += 1
+                    text = "\n".join( item[2] for item in batch[i:j] )
+
+                    # respect slack's rate limit between sends
+                    wait = SEND_INTERVAL - (time.time() - last_send)
+                    if wait > 0:
+                        time.sleep(wait)
+                    try:
+                        call = client.api_call(
+                            "chat.postMessage",
+                            channel=channel_id,
+                            text=text,
+                            username=username,
+                            icon_emoji=emoji
+                        )
+                    except Exception as err:
+                        # network trouble; the message is lost but
+                        # the worker keeps delivering the rest
+                        print("slack send error:", err)
+                    else:
+                        if not call.get('ok'):
+                            print("slack send error:", call.get('error'))
+                    last_send = time.time()
+                    i = j
+            finally:
+                for item in batch:
+                    self.queue.task_done()
+
+#shared outgoing message queue for this module
+_MSG_QUEUE = _MsgQueue()
+
+def flush_messages():
+    """Wait for all queued slack messages to be sent.
+
+    Call this before shutting down to make sure nothing queued by
+    send_message() is still waiting on the background thread.
+    """
+    _MSG_QUEUE.flush()
+
 def get_channels(client):
     """Return a full list of channels, with all accompanying info
 
@@ -68,11 +220,7 @@ def get_channels(client):
         ... 
         <'The result is a printing of all channels for slack team'>
     """
-    channels_call = client.api_call("channels.list")
-    if channels_call.get('ok'):
-        return channels_call['channels']
-    else:
-        return None
+    return _channel_cache(client)['channels']
 
 def get_channel_id(client, channel):
     """Get A specific channel's ID, if you know its name
@@ -95,10 +243,9 @@ def get_channel_id(client, channel):
         >>> msg
         '<GENERAL_CHANNEL_ID>'
     """
-    channels = get_channels(client)
-    for c in channels:
-        if c['name'] == channel:
-            return c['id']
+    c = _channel_cache(client)['by_name'].get(channel)
+    if c:
+        return c['id']
     return None
 
 def get_channel_name(client, channel_id):
@@ -124,10 +271,9 @@ def get_channel_name(client, channel_id):
         'general'
     """
     "Get Specific Channel Name"
-    channels = get_channels(client)
-    for c in channels:
-        if c['id'] == channel_id:
-            return c['name']
+    c = _channel_cache(client)['by_id'].get(channel_id)
+    if c:
+        return c['name']
     return None
 
 def get_channel_info(client, channel_id):
@@ -160,10 +306,15 @@ def get_channel_info(client, channel_id):
 def send_message(client, channel_id, message, username="TEQ-BOT", emoji=":robot_face:"):
     """Send a slack message to a specific channel.
 
-    The API call for properly formatting and sending a message to 
+    The call for properly formatting and sending a message to
     a public slack channel. Messages are accompanied by a username for the bot,
     as well as an emoji used as the bot's profile picture in slack.
 
+    The message is queued rather than sent inline; a background
+    worker batches messages headed to the same channel and spaces
+    out API calls to stay under slack's rate limit. Use
+    flush_messages() to wait for delivery before exiting.
+
     Please view http://www.webpagefx.com/tools/emoji-cheat-sheet/ for
     examples of valid emoji parameters.
 
@@ -194,25 +345,17 @@ def send_message(client, channel_id, message, username="TEQ-BOT", emoji=":robot_
         >>> msg
         'User TEQ-BOT\nsent message: Hello!\n to channel #general\n with emoji :robot_face:'
     """
-    call = client.api_call(
-        "chat.postMessage",
-        channel=channel_id,
-        text=message,
-        username=username,
-        icon_emoji=emoji
-    )
-
-    if call['ok']:
-        #return value is just a message
-        status = True
-        channel_name = get_channel_name(client, channel_id)
-        slack_msg = "User " + username + "\nsent message: " 
-        slack_msg = slack_msg + message + "\n to channel #" + channel_name
-        slack_msg = slack_msg + "\n with emoji " + emoji
-    else:
-        #return error message
-        status = False
-        slack_msg = "slack.send_message() error: message failed to send. | " + call['error']
+    if channel_id is None:
+        return False, "slack.send_message() error: no such channel."
+
+    #queue the message; the background worker batches and sends it
+    _MSG_QUEUE.put(client, channel_id, message, username, emoji)
+
+    status = True
+    channel_name = get_channel_name(client, channel_id)
+    slack_msg = "User " + username + "\nqueued message: "
+    slack_msg = slack_msg + message + "\n to channel #" + str(channel_name)
+    slack_msg = slack_msg + "\n with emoji " + emoji
     return status, slack_msg
 
 def usage():
@@ -230,9 +373,8 @@ def usage():
         >>> msg
         'stream.py usage:\n$ python slack.py "<YOUR_SLACK_WEB_API_TOKEN>"'
     """
-    msg = "slack.py usage:\n"
-    msg = msg + "$ python slack.py \"<YOUR_SLACK_WEB_API_TOKEN>\""
-    return msg
+    return ( "slack.py usage:\n"
+             "$ python slack.py \"<YOUR_SLACK_WEB_API_TOKEN>\"" )
     
 
 if __name__ == "__main__":
@@ -18,7 +18,7 @@ Attributes:
     NO_DATA (str): Error Code. No data retrieved from IceCast Server.
     URL_ERROR (str): Error Code. HTTP timeout, or bad internet connection.
     TIMEOUT_VALUE(int): Amount of time in seconds HTTP request will wait 
-        before returning a urllib.error.URLError.
+        before giving up on the request.
 
 Todo:
     * Look into why false negatives are returned for stream status.
@@ -32,9 +32,57 @@ Todo:
 """
 
 import sys
-from urllib.request import urlopen
-import urllib.error
-from bs4 import BeautifulSoup
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+
+#shared HTTP session for polling the IceCast server. the connection
+#(and its handshake) is reused between polls instead of being torn
+#down and rebuilt every few seconds.
+_SESSION = requests.Session()
+_ADAPTER = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+_SESSION.mount('http://', _ADAPTER)
+_SESSION.mount('https://', _ADAPTER)
+
+#prefer lxml's C parser for the IceCast status page; it parses the
+#same html several times faster than the pure-Python html.parser.
+#fall back gracefully when lxml isn't installed.
+try:
+    from lxml import etree as _etree
+    _BS_PARSER = 'lxml'
+except ImportError:
+    _etree = None
+    _BS_PARSER = 'html.parser'
+
+#selectolax's lexbor engine extracts the handful of <td> cells we
+#care about far faster than building a full BeautifulSoup tree.
+#BeautifulSoup remains the fallback when it isn't installed.
+try:
+    from selectolax.lexbor import LexborHTMLParser as _LexborParser
+except ImportError:
+    _LexborParser = None
+
+#everything ping_stream reads lives in <td> cells, so when falling
+#back to BeautifulSoup let it throw away the rest of the page while
+#parsing instead of building the whole tree
+_ONLY_TD = SoupStrainer('td')
+
+#soupsieve (BeautifulSoup's css engine) lets the td selector be
+#compiled once at import instead of re-resolved by find_all's
+#attribute matching on every poll. BeautifulSoup ships with it, but
+#keep the find_all fallback in case it's been stripped out.
+try:
+    import soupsieve
+    _SEL_TD = soupsieve.compile('td')
+except ImportError:
+    soupsieve = None
+
+#httpx provides the async client used by ping_stream_async, which
+#lets stream polling overlap other network work instead of blocking
+#on it. the synchronous path doesn't need it.
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 #potential stream errors
 NO_DATA   = "no data read from Icecast Server"
@@ -43,6 +91,43 @@ URL_ERROR = "HTTP Request Timeout"
 #how long to wait for timeout
 TIMEOUT_VALUE = 60
 
+#diagnosis messages, built once at import. these fire on every poll
+#cycle for as long as an outage lasts, so the failure path should be
+#a dict lookup rather than a string build. the None key holds the
+#unknown-error message.
+_ALERT_HEADER = ( "ALERT!! STREAM IS DOWN!!\n"
+                  "Likely cause: \n" )
+_MESSAGES = {
+    NO_DATA   : _ALERT_HEADER +
+                "No data read from Icecast server. \n"
+                "This at least means the computer is on, "
+                "and icecast is running, but the altacast "
+                "encoders aren't hooked up properly. This "
+                "most often happens when someone boots up "
+                "multiple instances of altacast on the station "
+                "computer. I would start with looking at that.",
+    URL_ERROR : _ALERT_HEADER +
+                "HTTP Request Timeout. \n"
+                "This could mean a multitude of things. "
+                "Right off the bat, we know that icecast is "
+                "acting off. This could be from the following "
+                "problems: \n"
+                "1) icecast has been closed on the computer\n"
+                "2) multiple instances of icecast are running\n"
+                "3) the station computer has lost internet access\n"
+                "4) the station computer is rebooting\n"
+                "5) the station computer is off, either from "
+                "shutting down or from crashing.\n\n"
+                "When diagnosing this issue, please check on AltaCast "
+                "as well, because that could also possibly be down.\n",
+    None      : _ALERT_HEADER +
+                "Unknown Error!!! \n"
+                "This should have never happened. "
+                "I have no idea what is wrong. I'm truly sorry.\n"
+                "Just sit things out for a bit and and everything will "
+                "be fine before long.\n",
+}
+
 def prep_message(cause="None"):
     """Prepare an error message to diagnose stream.
 
@@ -80,47 +165,17 @@ def prep_message(cause="None"):
     Todo: 
         Add any additional error types encountered.
     """
-    msg = "ALERT!! STREAM IS DOWN!!\n"
-    msg = msg + "Likely cause: \n"
-    if cause == NO_DATA:
-        msg = msg + "No data read from Icecast server. \n"
-        msg = msg + "This at least means the computer is on, "
-        msg = msg + "and icecast is running, but the altacast "
-        msg = msg + "encoders aren't hooked up properly. This "
-        msg = msg + "most often happens when someone boots up "
-        msg = msg + "multiple instances of altacast on the station "
-        msg = msg + "computer. I would start with looking at that."
-    elif cause == URL_ERROR:
-        msg = msg + "HTTP Request Timeout. \n"
-        msg = msg + "This could mean a multitude of things. "
-        msg = msg + "Right off the bat, we know that icecast is "
-        msg = msg + "acting off. This could be from the following "
-        msg = msg + "problems: \n"
-        msg = msg + "1) icecast has been closed on the computer\n"        
-        msg = msg + "2) multiple instances of icecast are running\n"
-        msg = msg + "3) the station computer has lost internet access\n"
-        msg = msg + "4) the station computer is rebooting\n"
-        msg = msg + "5) the station computer is off, either from "
-        msg = msg + "shutting down or from crashing.\n\n"
-        msg = msg + "When diagnosing this issue, please check on AltaCast "
-        msg = msg + "as well, because that could also possibly be down.\n"
-    else:
-        msg = msg + "Unknown Error!!! \n"
-        msg = msg + "This should have never happened. "
-        msg = msg + "I have no idea what is wrong. I'm truly sorry.\n"
-        msg = msg + "Just sit things out for a bit and and everything will "
-        msg = msg + "be fine before long.\n"
-    return msg
+    return _MESSAGES.get(cause, _MESSAGES[None])
 
 def now_playing(data):
-    """Clean up streamdata html to return song information.
+    """Clean up streamdata cell text to return song information.
 
-    Clean up a portion of HTML that contains the data for
-    whatever song is currently broadcasting on an IceCast 
-    stream.
+    Given the text of the streamdata table cells on an IceCast
+    status page, pick out the data for whatever song is currently
+    broadcasting on the stream.
 
-    Once the song is identified in the message, a #NowPlaying 
-    tag is added to it to identify the returned data as a 
+    Once the song is identified in the message, a #NowPlaying
+    tag is added to it to identify the returned data as a
     successful song ID.
 
     Full HTML example for KTEQ.ORG stream:
@@ -176,7 +231,7 @@ def now_playing(data):
     on a given server.)
 
     Args:
-        data (bs4.element.ResultSet): HTML segment containing song information 
+        data (list): text of each streamdata cell, in page order
 
     Returns:
         data (str): cleaned data string, containing just the song info.
@@ -184,27 +239,14 @@ def now_playing(data):
     Example:
 
         >>> import stream
-        >>> from urllib.request import urlopen
-        >>> import urllib.error
-        >>> from bs4 import BeautifulSoup
-        >>> url  = <YOUR_STREAM_URL_HERE>
-        >>> page = urlopen( url, timeout=60 )
-        >>> soup = BeautifulSoup(page, 'html.parser')
-        >>> data = soup.findAll('td', attrs={"class" : "streamdata" })
+        >>> data = ['KTEQ-FM', '91.3FM', 'Beat Market by Sun Machine']
         >>> msg  = stream.now_playing(data)
         >>> msg
-        '#NowPlaying Beat Market by Sun Machine'
+        '#NowPlaying: Beat Market by Sun Machine'
     """
-    # The very last <td> tagged value is the one we want. (contains song)
-    data = str(data[-1])
-
-    # get rid of html tags
-    data = data.replace("<td class=\"streamdata\">","")
-    data = data.replace("</td>","")
-
+    # The very last streamdata value is the one we want. (contains song)
     # add '#NowPlaying: ' to the beginning of song information
-    data = "#NowPlaying: " + data
-    return data
+    return "#NowPlaying: " + data[-1]
 
 def current_listeners(data):
     """Clean up streamdata html to return listener information.
@@ -212,49 +254,41 @@ def current_listeners(data):
     Parse through HTML to detemine listener count.
 
     Args:
-        data (bs4.element.ResultSet): HTML segment containing 
-            listener information 
+        data (list): text of each table cell, in page order
 
     Returns:
-        data (list): A pair of number in a list, corresponding to current 
+        data (list): A pair of number in a list, corresponding to current
             and peak listeners, respectively
 
     Example:
 
         >>> import stream
-        >>> from urllib.request import urlopen
-        >>> import urllib.error
-        >>> from bs4 import BeautifulSoup
-        >>> url  = <YOUR_STREAM_URL_HERE>
-        >>> page = urlopen( url, timeout=60 )
-        >>> soup = BeautifulSoup(page, 'html.parser')
-        >>> data = soup.findAll('td')
+        >>> data = ['Current Listeners:', '2', 'Peak Listeners:', '16']
         >>> msg  = stream.current_listeners(data)
         >>> msg
         [2, 16]
     """
-    # The very last <td> tagged value is the one we want. (contains song)
-
     current = 0 # current listeners
     peak    = 0 # peak listeners
 
-    for i in range(0, len(data)):
-        if "Current Listeners:" in data[i].text:
+    for i, cell in enumerate(data):
+        cell = cell.lstrip()
+        if cell.startswith("Current Listeners:"):
             # next value corresponds to current listener count
             # for a particular encoding.
-            current = current + int(data[i+1].text)
-        elif "Peak Listeners:" in data[i].text:
+            current = current + int(data[i+1])
+        elif cell.startswith("Peak Listeners:"):
             # next value corresponds to peak listener count
             # for a particular encoding.
-            peak = peak + int(data[i+1].text)
-    
+            peak = peak + int(data[i+1])
+
     return [current, peak]
 
-def ping_stream(url,listeners=False,debug=False):
+def ping_stream(url, debug=False, session=None):
     """Ping the music stream server for song info, stream status
 
     perform an HTTP request to copy all html data from an Icecast
-    Stream. 
+    Stream.
 
     If html data was successfullly retrieved:
         find all html tags labeled 'td' with attribute 'class=streamdata'
@@ -266,8 +300,12 @@ def ping_stream(url,listeners=False,debug=False):
     If HTTP request times out, resulting in no html data:
         report that the stream is down, return URL_ERROR error message
 
+    The page is fetched and parsed exactly once; song information and
+    listener counts both come out of the same pass, so callers that
+    want both no longer trigger two HTTP requests and two parses.
+
     This function uses the BeautifulSoup library for html parsing and
-    urllib library to perform an HTTP request. After a successful HTTP request,
+    requests library (through a shared pooled session) to perform an HTTP request. After a successful HTTP request,
     the function parses the html retrieved from the stream's site. This 
     returns all of the html used for the site, which is pruned down to 
     instances of <td>, or table, tags in the site's html. In particular, this 
@@ -286,12 +324,17 @@ def ping_stream(url,listeners=False,debug=False):
     Args:
         url (str): Online stream url.
         debug (bool): Optional flag for debugging outputs (unused)
+        session (requests.Session): Optional session to fetch with.
+            Defaults to the module's shared pooled session, which
+            keeps the connection to IceCast alive between polls.
 
     Returns:
             (tuple): tuple containing:
 
                 bool: True if stream is up, False if stream is down.
                 str: Song data if stream is up, Error message if stream is down
+                list: [current, peak] listener counts, or None if the
+                    page had no table cells to count
 
     Example:
 
@@ -299,32 +342,169 @@ def ping_stream(url,listeners=False,debug=False):
         >>> url  = <YOUR_STREAM_URL_HERE>
         >>> msg = stream.ping_stream(url)
         >>> msg
-        (True, '#NowPlaying: I Think I Smell a Rat by The White Stripes')
+        (True, '#NowPlaying: I Think I Smell a Rat by The White Stripes', [2, 16])
     """
+    if session is None:
+        session = _SESSION
     try:
-        # Try to access the page for 60 seconds
-        page = urlopen( url, timeout=TIMEOUT_VALUE )
-        soup = BeautifulSoup(page, 'html.parser')
-
-        # Check to see if "streamdata" exists
-        data = soup.findAll('td', attrs={"class" : "streamdata" })
-
-        # Also get counts
-        count = soup.findAll('td')
-
-        if listeners and len(count) > 0:
-            # Stream is up, let's retrieve listener count
-            return True, current_listeners(count)
-        if len(data) > 0:
-            # Stream is up, and retrieved current song data
-            return True, now_playing(data)
-        else:
-            # IceCast Server is up, Altacast isn't.
-            return False, prep_message(NO_DATA)
-    except urllib.error.URLError:
+        # Try to access the page for 60 seconds, reusing the pooled
+        # connection from previous polls when possible. streaming mode
+        # lets the incremental parser below stop the download early.
+        page = session.get( url, timeout=TIMEOUT_VALUE, stream=True )
+
+        if _etree is not None:
+            # incremental parse: cells are extracted while chunks
+            # arrive and the connection is dropped at </html>
+            data, count = _stream_td_cells(page)
+            return _ping_result(data, count)
+
+        # hand the raw bytes to the parser, letting it sniff the
+        # encoding itself
+        return _parse_stream_page(page.content)
+    except requests.exceptions.RequestException:
         # http request timed out after 60 seconds
         # IceCast Server not set up, Altacast might also be down.
-        return False, prep_message(URL_ERROR)
+        return False, prep_message(URL_ERROR), None
+
+def _stream_td_cells(page):
+    """Extract table cell text from a streaming IceCast response.
+
+    Chunks from the open response are fed straight into lxml's pull
+    parser, so parsing overlaps the download, and the connection is
+    closed as soon as the document ends instead of reading out any
+    trailing bytes. Stopping at the first </table> instead would lose
+    the listener counts that later mountpoint tables contribute, so
+    the whole document is consumed.
+
+    Args:
+        page (requests.Response): response opened with stream=True
+
+    Returns:
+            (tuple): tuple containing:
+
+                data (list): text of each td.streamdata cell
+                count (list): text of every td cell
+    """
+    parser = _etree.HTMLPullParser(events=('end',))
+    data   = []
+    count  = []
+    done   = False
+    for chunk in page.iter_content(8192):
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if elem.tag == 'td':
+                text = "".join(elem.itertext())
+                count.append(text)
+                if 'streamdata' in (elem.get('class') or '').split():
+                    data.append(text)
+            elif elem.tag == 'html':
+                done = True
+        if done:
+            # document is over; drop the connection rather than
+            # reading whatever the server still has buffered
+            page.close()
+            break
+    return data, count
+
+def _parse_stream_page(html):
+    """Parse a fetched IceCast status page into the ping results.
+
+    Shared by the synchronous and asynchronous ping paths; only the
+    fetch differs between them.
+
+    Args:
+        html (bytes): raw IceCast status page
+
+    Returns:
+            (tuple): same (up, message, listeners) tuple that
+            ping_stream returns
+    """
+    # the streamdata cells are a subset of the td cells, so walk the
+    # tree once for every td and partition in Python instead of
+    # running a second full traversal for the streamdata class
+    if _LexborParser is not None:
+        # selectolax: one cheap css query on the lexbor tree
+        tree  = _LexborParser(html)
+        tds   = tree.css('td')
+        count = [ n.text() for n in tds ]
+        data  = [ text for n, text in zip(tds, count)
+                  if 'streamdata' in (n.attributes.get('class') or '').split() ]
+    else:
+        soup = BeautifulSoup(html, _BS_PARSER, parse_only=_ONLY_TD)
+
+        if soupsieve is not None:
+            # pre-compiled selector skips find_all's per-call matching
+            tds = _SEL_TD.select(soup)
+        else:
+            tds = soup.findAll('td')
+
+        count = [ td.get_text() for td in tds ]
+        data  = [ text for td, text in zip(tds, count)
+                  if 'streamdata' in (td.get('class') or []) ]
+
+    return _ping_result(data, count)
+
+def _ping_result(data, count):
+    """Turn extracted cell text into the ping_stream result tuple.
+
+    Args:
+        data (list): text of each td.streamdata cell
+        count (list): text of every td cell
+
+    Returns:
+            (tuple): same (up, message, listeners) tuple that
+            ping_stream returns
+    """
+    # listener counts come from the same parse
+    listeners = current_listeners(count) if len(count) > 0 else None
+
+    if len(data) > 0:
+        # Stream is up, and retrieved current song data
+        return True, now_playing(data), listeners
+    else:
+        # IceCast Server is up, Altacast isn't.
+        return False, prep_message(NO_DATA), listeners
+
+def close_session():
+    """Close the shared session's pooled connections.
+
+    Meant for callers shutting down a long poll loop; the next
+    request after this transparently opens a fresh connection.
+    """
+    _SESSION.close()
+
+def make_async_client():
+    """Create the shared httpx client used for async polling.
+
+    Returns:
+            (httpx.AsyncClient): pooled async client, or None when
+            httpx isn't installed
+    """
+    if httpx is None:
+        return None
+    limits = httpx.Limits(max_keepalive_connections=8)
+    return httpx.AsyncClient(limits=limits)
+
+async def ping_stream_async(client, url):
+    """Asynchronous variant of ping_stream.
+
+    Awaiting the fetch lets the caller poll IceCast while other
+    network work (TuneIn posts, slack reports) is in flight, instead
+    of each request blocking the next.
+
+    Args:
+        client (httpx.AsyncClient): shared client from make_async_client()
+        url (str): Online stream url.
+
+    Returns:
+            (tuple): same (up, message, listeners) tuple that
+            ping_stream returns
+    """
+    try:
+        page = await client.get(url, timeout=TIMEOUT_VALUE)
+    except httpx.HTTPError:
+        return False, prep_message(URL_ERROR), None
+    return _parse_stream_page(page.content)
 
 def usage():
     """Print Usage Statement.
@@ -341,21 +521,20 @@ def usage():
         >>> msg
         'stream.py usage:\n$ python stream.py "<YOUR_STREAM_URL>"'
     """
-    msg = "stream.py usage:\n"
-    msg = msg + "$ python stream.py \"<YOUR_STREAM_URL>\""
-    return msg
+    return ( "stream.py usage:\n"
+             "$ python stream.py \"<YOUR_STREAM_URL>\"" )
     
 
 if __name__ == "__main__":
     if(len(sys.argv) > 1):
-        ping, message = ping_stream(sys.argv[1], False, True)
-        ping, counts = ping_stream(sys.argv[1], True, True)
+        ping, message, counts = ping_stream(sys.argv[1], True)
         if ping:
             print("Station is online")
         else:
             print("Station is offline")
         print(message)
-        print("Current Listeners:", counts[0])
-        print("Peak    Listeners:", counts[1])
+        if counts:
+            print("Current Listeners:", counts[0])
+            print("Peak    Listeners:", counts[1])
     else:
         print(usage())
\ No newline at end of file
@@ -20,14 +20,14 @@ operating properly.
 
 Attributes:
     STANDARD_FREQUENCY (int): default frequency in seconds for scheduler
-    NOW_PLAYING (str): bitstring corresponding to now playing task
-    STREAM_STATUS (str): bitstring corresponding to stream status task
-    CHECK_LYRICS (str): bitstring corresponding to check lyrics task
-    SWEAR_LOG (str): bitstring corresponding to swear log task
-    OPTION_5 (str): bitstring corresponding to placeholder task 5
-    OPTION_6 (str): bitstring corresponding to placeholder task 6
-    OPTION_7 (str): bitstring corresponding to placeholder task 7
-    OPTION_8 (str): bitstring corresponding to placeholder task 8
+    NOW_PLAYING (int): bitmask corresponding to now playing task
+    STREAM_STATUS (int): bitmask corresponding to stream status task
+    CHECK_LYRICS (int): bitmask corresponding to check lyrics task
+    SWEAR_LOG (int): bitmask corresponding to swear log task
+    OPTION_5 (int): bitmask corresponding to placeholder task 5
+    OPTION_6 (int): bitmask corresponding to placeholder task 6
+    OPTION_7 (int): bitmask corresponding to placeholder task 7
+    OPTION_8 (int): bitmask corresponding to placeholder task 8
     ROBOT_EMOJI (str): robot face emoji
     SKULL_EMOJI (str): skull emoji
     MUSIC_EMOJI (str): musical note emoji
@@ -49,29 +49,185 @@ import os
 import time
 import slack
 import stream
-import tunein
-import genius
-import log
 import shlex
 import subprocess
+import heapq
+import logging
+import asyncio
+import hashlib
+import shutil
+import signal
+import selectors
+import functools
+import threading
+
+#genius (which drags in nltk), tunein, and log are imported lazily
+#inside the methods that need them, so a process that only pings the
+#stream or posts to slack never pays their import cost
+
+#watchdog (inotify on linux) lets the scheduler hear about stat-file
+#writes from the kernel instead of polling for them. the polling
+#path stays as the fallback when it isn't installed.
+try:
+    from watchdog.observers import Observer as _WatchObserver
+    from watchdog.events import FileSystemEventHandler as _WatchHandler
+except ImportError:
+    _WatchObserver = None
+    _WatchHandler  = object
+from concurrent.futures import ThreadPoolExecutor
+
+#scheduler messages go through a leveled logger rather than bare
+#prints, so long-running deployments can throttle or silence them
+#without losing the task output itself
+_LOG = logging.getLogger('teqbot.scheduler')
 
 #standard frequency (in seconds)
 STANDARD_FREQUENCY = 5
 
-NOW_PLAYING   = '00000001'
-STREAM_STATUS = '00000010'
-CHECK_LYRICS  = '00000100'
-SWEAR_LOG     = '00001000'
-OPTION_5      = '00010000'
-OPTION_6      = '00100000'
-OPTION_7      = '01000000'
-UPDATE_REPO   = '10000000'
+#separator between song and artist in stream metadata
+_SEP = "__by__"
+
+#environment variables TeqBot cannot run without
+_REQUIRED_ENV = ( 'SLACK_TOKEN', 'STREAM_URL', 'PYTHONPATH',
+                  'TUNEIN_STATION_ID', 'TUNEIN_PARTNER_ID',
+                  'TUNEIN_PARTNER_KEY', 'GENIUS_TOKEN', 'LOGGERPATH' )
+
+#how often (in seconds) the sleeping scheduler re-checks the stat
+#file for an externally written "Done"
+STAT_POLL_INTERVAL = 5
+
+NOW_PLAYING   = 0x01
+STREAM_STATUS = 0x02
+CHECK_LYRICS  = 0x04
+SWEAR_LOG     = 0x08
+OPTION_5      = 0x10
+OPTION_6      = 0x20
+OPTION_7      = 0x40
+UPDATE_REPO   = 0x80
 
 #feel free to add more emojis to this list
 ROBOT_EMOJI = ':robot_face:'
 SKULL_EMOJI = ':skull:'
 MUSIC_EMOJI = ':musical_note:'
 
+#the scheduler's task table: (bitmask, log label, task name, interval).
+#intervals are absolute seconds at the standard frequency, replacing
+#the old 2x/20x/1200x multiplier arithmetic scattered through the
+#loop; tuning a cadence is a one-line edit here.
+TASK_TABLE = [
+    (NOW_PLAYING,   "Handling NowPlaying Status...", 'nowplaying',   10),
+    (STREAM_STATUS, "Handling Stream Status...",     'status',      100),
+    (CHECK_LYRICS,  "Checking Lyrics...",            'lyric',         5),
+    (SWEAR_LOG,     "Checking Swear Log...",         'swear',         5),
+    (UPDATE_REPO,   "Updating TeqBot...",            'update',     6000),
+]
+
+class _StatFileWatch(_WatchHandler):
+    """Watchdog handler that fires a callback on .teq.stat writes.
+
+    Used by the scheduler so an externally written 'Done' (the kill
+    command) is noticed the moment the kernel reports it, rather
+    than at the next poll.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def on_modified(self, event):
+        if event.src_path.endswith('.teq.stat'):
+            self.callback()
+
+    # atomic writes land as a rename of the temp file onto the
+    # target, which some backends report as created/moved
+    on_created = on_modified
+
+    def on_moved(self, event):
+        if event.dest_path.endswith('.teq.stat'):
+            self.callback()
+
+def _file_digest(path):
+    """Return the sha256 digest of a file's raw bytes.
+
+    hashlib's C implementation (SHA-NI backed on recent CPUs) makes
+    this far cheaper than parsing a file as JSON just to compare it
+    to another. The file is read in chunks, so memory stays constant
+    regardless of size.
+
+    Args:
+        path (str): file to hash
+
+    Returns:
+        (bytes): sha256 digest of the file contents
+
+    """
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            # 3.11+: releases the GIL while hashing
+            return hashlib.file_digest(f, 'sha256').digest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.digest()
+
+#on Linux, O_NOATIME tells the kernel to skip the inode atime update
+#when reading. the status files get polled constantly, so without it
+#every read costs a metadata write. on platforms without the flag the
+#extra bit is zero and this is a plain read-only open.
+_O_READ = os.O_RDONLY | getattr(os, 'O_NOATIME', 0)
+
+def _read_file(path):
+    """Read a small status file without updating its atime.
+
+    Raises FileNotFoundError like open() would if the file is absent,
+    so callers keep their existing error handling.
+
+    Args:
+        path (str): file to read
+
+    Returns:
+        (bytes): raw file contents
+
+    """
+    try:
+        fd = os.open(path, _O_READ)
+    except PermissionError:
+        # O_NOATIME is owner-only; fall back to a plain open
+        fd = os.open(path, os.O_RDONLY)
+    try:
+        chunks = []
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        if hasattr(os, 'posix_fadvise'):
+            # the contents are cached in-process after this read, so
+            # tell the kernel it can evict its copy right away rather
+            # than holding these pages for the life of the daemon
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return b"".join(chunks)
+
+def _atomic_write(path, data):
+    """Write data to a file atomically.
+
+    The data lands in a temp file that is renamed over the target
+    with os.replace, so a reader in another process sees either the
+    old contents or the new ones, never a half-written file. Without
+    this, a task reading .teq.song mid-write could see a truncated
+    song and post a duplicate now-playing message.
+
+    Args:
+        path (str): destination file name
+        data (bytes): file contents
+
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
 class TeqBot:
     """TeqBot, the class for handling stream monitoring tasks
 
@@ -98,27 +254,34 @@ class TeqBot:
     def __init__(self):
         """TeqBot class initialization method.
 
-        The TeqBot __init__ method's most important task is to read in
-        several environment variables in order for the bot to function.
-        These variables are stored as environmental variables in order
-        to maintain a level of confidentiality, as some of these values
-        should not be widely distributed. These environmental variables
-        can be modified to simple hardcoded information, but this is
-        generally not recommended.
+        The TeqBot __init__ method verifies that every environment
+        variable the bot needs is present, and fails fast if any are
+        missing. These variables are stored as environmental variables
+        in order to maintain a level of confidentiality, as some of
+        these values should not be widely distributed. The values
+        themselves are read lazily, by the cached properties below,
+        the first time a task actually needs them.
 
         Default values are also assigned to TeqBot's slack properties.
         The default name for TeqBot on slack is 'TEQ-BOT', and the
         default emoji is the robot face.
 
+        Raises:
+            RuntimeError: if any of the required environment
+                variables are unset; the message names them.
+
         """
-        self.slack  = SlackClient( os.environ.get('SLACK_TOKEN') )
-        self.stream = os.environ.get('STREAM_URL')
-        self.python = os.environ.get('PYTHONPATH')
-        self.tuneinStationID  = os.environ.get('TUNEIN_STATION_ID')
-        self.tuneinPartnerID  = os.environ.get('TUNEIN_PARTNER_ID')
-        self.tuneinPartnerKey = os.environ.get('TUNEIN_PARTNER_KEY')
-        self.geniusToken = { 'Authorization' : 'Bearer ' + os.environ.get('GENIUS_TOKEN') }
-        self.logger = os.environ.get('LOGGERPATH')
+        # check every setting in one pass and fail fast. a missing
+        # variable used to surface later as a confusing crash deep
+        # inside a slack or genius call; now it names the missing
+        # variables up front. the values themselves are picked up by
+        # the cached properties on first use, so an invocation that
+        # never posts to tunein never loads the tunein credentials.
+        missing = [ name for name in _REQUIRED_ENV
+                    if os.environ.get(name) is None ]
+        if missing:
+            raise RuntimeError("TeqBot is missing environment variables: "
+                               + ", ".join(missing))
         self.username = 'TEQ-BOT'
         self.emoji    = ROBOT_EMOJI
         self.channel = None
@@ -126,110 +289,398 @@ class TeqBot:
         self.lastSong = ""
         self.lastSwear = None
 
-    def scheduler(self, event='11111111', frequency=STANDARD_FREQUENCY):
+        # task dispatch table for spawn_task. by default tasks run on
+        # a small shared thread pool inside this process, so the
+        # interpreter and its imports start once instead of once per
+        # task.
+        self._dispatch = { 'nowplaying' : self.task_now_playing,
+                           'status'     : self.task_stream_status,
+                           'lyric'      : self.task_check_lyrics,
+                           'swear'      : self.task_swear_log,
+                           'update'     : self.task_update_repo }
+        self._pool = None
+        self.subprocessTasks = False
+        self._shutdown = False
+
+        # pool tasks share this TeqBot instance, and teq_message
+        # threads its message/channel/emoji through instance
+        # attributes; the lock keeps overlapping tasks from
+        # interleaving those setters and posting a mismatched
+        # message/channel/emoji combination
+        self._message_lock = threading.Lock()
+
+        # in-memory copies of the tiny .teq bookkeeping files. these
+        # values are written by teqbot itself, so the getters can skip
+        # the filesystem round trip once a value is known. the stat
+        # cache keeps (mtime, contents) because other processes (the
+        # kill command) write .teq.stat too.
+        self._last_song_cache  = None
+        self._last_lyric_cache = None
+        self._stat_cache       = None
+
+        # hash of the last recorded song's bytes. most polls see the
+        # same song still playing, and a hash mismatch proves a new
+        # song without comparing the full metadata strings.
+        self._last_check_hash  = None
+
+        # last seen (mtime, size) of the logger's swear.json, so the
+        # swear log task can skip the JSON parse + deep compare when
+        # the file hasn't changed on disk
+        self._swear_mtime = 0
+        self._swear_size  = -1
+        self._last_swear_digest = None
+
+        # (monotonic time, message) of the last IceCast ping, so
+        # back-to-back get_now_playing callers within a second share
+        # one HTTP round trip
+        self._np_cache = (0.0, None)
+
+        # profanity lists keyed by filename as (mtime, words); the
+        # list rarely changes, so the lyrics task shouldn't re-read
+        # and re-build it on every song
+        self._profanity_cache = {}
+
+        # channel name -> id. the channels teqbot posts to never
+        # change, so after the first lookup set_channel is a local
+        # dict hit; entries are dropped when a send to them fails
+        self._channel_id_cache = {}
+
+        # tunein.post with the station credentials pre-bound; built
+        # on first use so the tunein import stays lazy
+        self._tunein_post = None
+
+        # nowPlaying.txt contents keyed by filename as
+        # ((mtime, size), text); the lyrics task re-reads this file
+        # every tick and it only changes when the logger writes it
+        self._np_logger_cache = {}
+
+    # each setting below is a cached_property: the first access pays
+    # the environment lookup (and, for slack, the client
+    # construction) and stores the value in the instance __dict__,
+    # after which it reads like a plain attribute. __init__ already
+    # verified the variables exist, so these lookups cannot fail.
+
+    @functools.cached_property
+    def slack(self):
+        'slackclient object used to perform slack API calls'
+        return SlackClient( os.environ['SLACK_TOKEN'] )
+
+    @functools.cached_property
+    def stream(self):
+        'URL of the IceCast stream'
+        return os.environ['STREAM_URL']
+
+    @functools.cached_property
+    def python(self):
+        'path to the python3 executable for task spawning'
+        return os.environ['PYTHONPATH']
+
+    @functools.cached_property
+    def tuneinStationID(self):
+        'TuneIn Station ID value'
+        return os.environ['TUNEIN_STATION_ID']
+
+    @functools.cached_property
+    def tuneinPartnerID(self):
+        'TuneIn Partner ID'
+        return os.environ['TUNEIN_PARTNER_ID']
+
+    @functools.cached_property
+    def tuneinPartnerKey(self):
+        'TuneIn Partner Key'
+        return os.environ['TUNEIN_PARTNER_KEY']
+
+    @functools.cached_property
+    def geniusToken(self):
+        'authorization header for the genius lyrics API'
+        return { 'Authorization' : 'Bearer ' + os.environ['GENIUS_TOKEN'] }
+
+    @functools.cached_property
+    def logger(self):
+        'path to the song logger output'
+        return os.environ['LOGGERPATH']
+
+    @functools.cached_property
+    def _task_commands(self):
+        # pre-split legacy task commands; the subprocess fallback
+        # invokes the same five commands forever, so build and
+        # shlex.split each one exactly once, on first use
+        return { name : shlex.split(
+                     "{0} teqbot task --{1}".format(self.python, name))
+                 for name in self._dispatch }
+
+    def scheduler(self, event=0xFF, frequency=STANDARD_FREQUENCY,
+                  subprocess_tasks=False):
         """Scheduler for spawning TeqBot tasks at predetermined intervals.
 
         This method will first determine which tasks will be called by
         performing bitwise operations. Each task is assigned to a bit
-        in an 8-bit string; if the given task's bit is set to 1, that
+        in an 8-bit mask; if the given task's bit is set to 1, that
         task will be spawned when the scheduler triggers events.
 
         The scheduler then goes into a potentially infinite loop. Each
-        task has a 'clock' that monitors how many seconds have elapsed
-        since the task was last spawned. Once a clock has hit the value
-        equivalent to the task's frequency, the task will be executed.
-        These tasks are spawned as new processes, which helps prevent
-        the entire scheduler from crashing if one particular process
-        encounters a runtime error for whatever reason.
-
-        After updating the clock on each cycle, the scheduler checks on
-        TeqBot's stat file. If this stat file reads 'Done', the scheduler
-        will terminate operations. This offers TeqBot a graceful way to
-        cease operations without killing the scheduler's process. The stat
-        file can be updated using the TeqBot.set_stat_file() method. Ending
-        the scheduler will delete the TeqBot stat file.
+        enabled task sits in a min-heap keyed by its next fire time;
+        the scheduler sleeps until the earliest deadline, spawns that
+        task, and pushes it back with its next deadline. Compared to
+        the old loop, which woke every second just to bump counters,
+        this wakes only when a task is actually due. Tasks run on a
+        small thread pool inside this process by default, so the
+        interpreter starts once rather than once per task; pass
+        subprocess_tasks=True to spawn each task as its own process
+        the old way, which isolates the scheduler from a task crash
+        at the cost of interpreter startup each time.
+
+        While sleeping, the scheduler still checks on TeqBot's stat
+        file every few seconds (STAT_POLL_INTERVAL). If this stat file
+        reads 'Done', the scheduler will terminate operations. This
+        offers TeqBot a graceful way to cease operations without
+        killing the scheduler's process. The stat file can be updated
+        using the TeqBot.set_stat_file() method. Ending the scheduler
+        will delete the TeqBot stat file.
 
         Args:
-            event (str): events string. Later converted to binary for bitwise
-                operations for determining which tasks are called. Defaults
-                to '11111111', which dictates that all tasks should be spawned.
+            event (int): events bitmask, tested against the task
+                constants to determine which tasks are called. An
+                8-bit string like '00000011' is still accepted and
+                parsed. Defaults to 0xFF, which dictates that all
+                tasks should be spawned.
             frequency (int): The base frequency for when tasks are spawned.
                 This value is in seconds, so a frequency of value 60 means
                 the base frequency for the tasks is once every minute.
                 Defaults to STANDARD_FREQUENCY, a value at the top of
                 teq.py that can be modified. This value should be 60 normally.
+            subprocess_tasks (bool): spawn each task as a separate
+                python process instead of running it on the in-process
+                thread pool. Defaults to False.
+
+        """
+        self.subprocessTasks = subprocess_tasks
+        self.set_last_played("None")
+        self.set_stat_file("Running")
+        self.get_last_played()
+
+        # seed the deadline heap; every enabled task fires once
+        # immediately, just like the old zeroed clocks did
+        now  = time.monotonic()
+        heap = []
+        for label, name, period in self._enabled_tasks(event, frequency):
+            heapq.heappush(heap, (now, label, name, period))
+
+        # keep messages visible for anyone who hasn't configured
+        # logging; a no-op when handlers are already installed
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+        # cooperative shutdown: SIGTERM/SIGINT flip the shutdown flag
+        # and poke a self-pipe, so a sleeping scheduler wakes at once
+        # instead of at its next poll. the stat-file "Done" check is
+        # kept for the kill command, which runs in another process.
+        self._shutdown = False
+        wake_r, wake_w = os.pipe()
+
+        def _sig(signum, frame):
+            self._shutdown = True
+            try:
+                os.write(wake_w, b'x')
+            except OSError:
+                pass
+
+        try:
+            old_term = signal.signal(signal.SIGTERM, _sig)
+            old_int  = signal.signal(signal.SIGINT, _sig)
+        except ValueError:
+            # not running on the main thread; the stat-file path
+            # still shuts us down
+            old_term = old_int = None
+
+        sel = selectors.DefaultSelector()
+        sel.register(wake_r, selectors.EVENT_READ)
+
+        # with watchdog available, the kernel tells us the moment
+        # .teq.stat is written and the handler pokes the same pipe
+        # the signals use; the timed poll below stays as a backstop
+        observer = None
+        if _WatchObserver is not None:
+            def _on_stat_write():
+                if self.check_stat_file("Done"):
+                    self._shutdown = True
+                    try:
+                        os.write(wake_w, b'x')
+                    except OSError:
+                        pass
+            observer = _WatchObserver()
+            observer.schedule(_StatFileWatch(_on_stat_write), '.')
+            observer.start()
+
+        _LOG.info("running Scheduler")
+        try:
+            while not self._shutdown:
+                now = time.monotonic()
+                if heap:
+                    fire = heap[0][0]
+                else:
+                    # no tasks enabled; just wait on the stat file
+                    fire = now + STAT_POLL_INTERVAL
+
+                if fire > now:
+                    # wait on the self-pipe with the deadline as the
+                    # timeout: a signal ends the wait immediately, and
+                    # the cap keeps the external "Done" check prompt
+                    if sel.select(min(fire - now, STAT_POLL_INTERVAL)):
+                        break
+                else:
+                    # earliest task is due; fire it and push it back
+                    # with its next deadline
+                    fire, label, name, period = heap[0]
+                    _LOG.info(label)
+                    self.spawn_task(name)
+                    heapq.heapreplace(heap, (max(fire + period, now + period),
+                                             label, name, period))
+
+                # break out of the scheduler if stat file contains "Done"
+                if self.check_stat_file("Done"):
+                    break
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            if old_term is not None:
+                signal.signal(signal.SIGTERM, old_term)
+                signal.signal(signal.SIGINT, old_int)
+            sel.close()
+            os.close(wake_r)
+            os.close(wake_w)
+            self.delete_stat_file()
+            # drop the pooled IceCast connections now that polling
+            # has stopped
+            stream.close_session()
+            _LOG.info("Finished Scheduler")
+
+    def _enabled_tasks(self, event, frequency):
+        """Resolve an event bitmask into the tasks it enables.
+
+        Args:
+            event (int): events bitmask, or the legacy 8-bit string.
+            frequency (int): base frequency in seconds.
+
+        Returns:
+            list: (label, name, period) tuples for each enabled task,
+                where period is the task's interval in seconds.
 
         """
-        # reset some flags
-        nowPlayingClock   = 0
-        streamStatusClock = 0
-        updateRepoClock   = 0
-        checkLyricsClock  = 0
-        swearLogClock     = 0
+        # accept the old 8-bit string form for compatibility
+        if isinstance(event, str):
+            event = int(event, 2)
+
+        # intervals in TASK_TABLE are absolute seconds at the
+        # standard frequency; a caller-supplied frequency scales them
+        # so scheduler(frequency=60) still means what it used to
+        scale = frequency / STANDARD_FREQUENCY
+        return [ (label, name, interval * scale)
+                 for mask, label, name, interval in TASK_TABLE
+                 if event & mask ]
+
+    def scheduler_asyncio(self, event=0xFF, frequency=STANDARD_FREQUENCY):
+        """Host all periodic tasks on one asyncio event loop.
+
+        An alternative front end to scheduler() that lets asyncio's
+        own timer heap compute each wakeup. Every enabled task gets a
+        coroutine that runs the task body on the shared thread pool
+        (the bodies still do blocking HTTP) and then sleeps for its
+        interval, so all timers live in a single thread and the loop
+        is free to await other work between firings. Shutdown works
+        the same way as scheduler(): write 'Done' to the stat file.
 
+        Args:
+            event (int): events bitmask, as for scheduler().
+            frequency (int): base frequency in seconds, as for
+                scheduler().
+
+        """
         self.set_last_played("None")
         self.set_stat_file("Running")
         self.get_last_played()
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        asyncio.run(self._scheduler_async(event, frequency))
+
+    async def _scheduler_async(self, event, frequency):
+        'gather one periodic coroutine per enabled task, watch for Done'
+        self._shutdown = False
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=4)
+
+        _LOG.info("running Scheduler")
+        runners = [ asyncio.ensure_future(self._periodic(label, name, period))
+                    for label, name, period in
+                    self._enabled_tasks(event, frequency) ]
+        try:
+            # watch the stat file for an externally written "Done"
+            while not self._shutdown:
+                await asyncio.sleep(STAT_POLL_INTERVAL)
+                if self.check_stat_file("Done"):
+                    self._shutdown = True
+        finally:
+            for runner in runners:
+                runner.cancel()
+            await asyncio.gather(*runners, return_exceptions=True)
+            self.delete_stat_file()
+            stream.close_session()
+            _LOG.info("Finished Scheduler")
+
+    async def _periodic(self, label, name, period):
+        'fire one named task every period seconds'
+        loop = asyncio.get_event_loop()
+        while not self._shutdown:
+            _LOG.info(label)
+            try:
+                # the task bodies block on HTTP, so they run on the
+                # thread pool rather than stalling the event loop
+                await loop.run_in_executor(self._pool, self._dispatch[name])
+            except Exception:
+                _LOG.exception("task %s failed", name)
+            await asyncio.sleep(period)
+
+    def spawn_task(self, name):
+        """Spawn a named TeqBot task.
+
+        By default the task method runs on a small shared thread
+        pool inside this process, so the interpreter (and its imports
+        of slackclient, stream, genius, ...) starts once rather than
+        once per task. When the scheduler was started with
+        subprocess_tasks=True, this instead falls back to forking a
+        fresh python interpreter per task, the old behavior.
 
-        # determine which tasks will be called
-        nowPlaying   = int( "{0:b}".format( int( event, 2) & int(NOW_PLAYING,   2) ) )
-        streamStatus = int( "{0:b}".format( int( event, 2) & int(STREAM_STATUS, 2) ) )
-        updateRepo   = int( "{0:b}".format( int( event, 2) & int(UPDATE_REPO,   2) ) )
+        Args:
+            name (str): task name, one of the keys of the dispatch
+                table built in __init__ ('nowplaying', 'status',
+                'lyric', 'swear', 'update').
 
-        # New tasks in dev
-        checkLyrics   = int( "{0:b}".format( int( event, 2) & int(CHECK_LYRICS, 2) ) )
-        swearLog      = int( "{0:b}".format( int( event, 2) & int(SWEAR_LOG,    2) ) )
+        """
+        if self.subprocessTasks:
+            # the command was built and split once in __init__
+            subprocess.Popen(self._task_commands[name])
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=4)
+        future = self._pool.submit(self._dispatch[name])
+        # nothing ever waits on the future, so without this callback
+        # an exception in the task body would vanish unseen
+        future.add_done_callback(
+            functools.partial(self._log_task_outcome, name))
+
+    def _log_task_outcome(self, name, future):
+        """Log a finished pool task's exception, if it raised one.
 
-        print("running Scheduler")
-        while True:
-            #trigger events
-            if nowPlaying and nowPlayingClock % (frequency * 2) == 0:
-                # only check nowplaying at 1/2 frequeny
-                print("Handling NowPlaying Status...")
-                self.spawn_task(self.python + " teqbot task --nowplaying")
-                nowPlayingClock = 1
-            if streamStatus and streamStatusClock % (frequency * 20) == 0:
-                # only check status at 1/20th frequency
-                print("Handling Stream Status...")
-                self.spawn_task(self.python + " teqbot task --status")
-                streamStatusClock = 1
-            if checkLyrics and checkLyricsClock % frequency == 0:
-                # update repo at normal frequency
-                print("Checking Lyrics...")
-                self.spawn_task(self.python + " teqbot task --lyric")
-                checkLyricsClock = 1
-            if swearLog and swearLogClock % frequency == 0:
-                # update repo at normal frequency
-                print("Checking Swear Log...")
-                self.spawn_task(self.python + " teqbot task --swear")
-                swearLogClock = 1
-            if updateRepo and updateRepoClock % (frequency * 1200) == 0:
-                # update repo at 1/1200th frequency
-                print("Updating TeqBot...")
-                self.spawn_task(self.python + " teqbot task --update")
-                updateRepoClock = 1
-            time.sleep(1)
-            nowPlayingClock   += 1
-            streamStatusClock += 1
-            updateRepoClock   += 1
-            checkLyricsClock  += 1
-            swearLogClock     += 1
-            print("n:", nowPlayingClock,
-                  "s:", streamStatusClock,
-                  "l:", checkLyricsClock,
-                  "w:", swearLogClock,
-                  "u:", updateRepoClock)
-
-            # break out of the scheduler if stat file contains "Done"
-            if self.check_stat_file("Done"):
-                self.delete_stat_file()
-                break
+        Args:
+            name (str): task name, as passed to spawn_task.
+            future (concurrent.futures.Future): the task's future.
 
-        # end of loop
-        print("Finished Scheduler")
+        """
+        err = future.exception()
+        if err is not None:
+            _LOG.error("task %s failed", name, exc_info=err)
 
-    def spawn_task(self, command):
-        """Spawn a task as a new process.
+    def spawn_process(self, command):
+        """Spawn a command as a new process.
 
         Simply splits a command into individual command line
         arguments, then spawns a new task using subprocess.Popen().
@@ -270,15 +721,18 @@ class TeqBot:
 
         """
         self.get_last_played()
+        # ping once and reuse the result for both the comparison and
+        # the post; this used to ping IceCast twice per tick
+        current = self.get_now_playing()
         # compare last song to what is currently playing
-        print("NOW PLAYING: Comparing", self.lastSong, "|", self.get_now_playing() )
-        newsong = self.check_last_played()
+        print("NOW PLAYING: Comparing", self.lastSong, "|", current )
+        newsong = self.check_last_played(current)
         if newsong:
             print("New Song")
             # update #nowplaying on slack
-            self.teq_message(self.now_playing(self.lastSong), "nowplaying", MUSIC_EMOJI)
+            self.teq_message(self.now_playing(current), "nowplaying", MUSIC_EMOJI)
             # post metadata to TuneIn
-            self.tunein(self.lastSong)
+            self.tunein(current)
         else:
             print("Same Song")
 
@@ -311,11 +765,19 @@ class TeqBot:
             it is for your stream to be online constantly.
 
         """
+        delay = 0.2
         for i in range(0, 5):
             online, msg = self.ping_stream()
             # make 5 attempts to connect.
             if online:
                 break
+            if i < 4:
+                # back off between attempts; a transient failure gets
+                # a moment to clear instead of four back-to-back
+                # retries hitting the same condition. no sleep after
+                # the final attempt, which would only delay the alert.
+                time.sleep(delay)
+                delay *= 2
         if online:
             # Only do something if the stream HAD been down
             # If this is the case, then let everyone know
@@ -364,6 +826,7 @@ class TeqBot:
             msg = ""
 
             # Perform genius search and compose message(s)
+            import genius  #lazy; only the lyrics path needs it
             msg, clean = genius.run(song,artist,bad_words,self.geniusToken)
 
             if not clean:
@@ -402,20 +865,38 @@ class TeqBot:
         """
 
 
+        import log  #lazy; only this task touches the json helpers
+
         # Read json file
         filename = "swear.json"
         filename = os.path.join(self.logger, filename)
 
-        data = log.read_json(filename)
-
-        filename = "lastSwear.json"
-        filename = os.path.join(self.logger, filename)
-        lastSwear = log.read_json(filename)
-
-        print("LOG: Comparing\n", data, "|\n", lastSwear )
-        if not log.compare_json(data, lastSwear):
-            # Not Identical, New json file
-            log.write_json(data,filename)
+        # one stat call decides whether anything else is worth doing;
+        # an unchanged file means an unchanged log
+        st = os.stat(filename)
+        if (st.st_mtime_ns, st.st_size) == (self._swear_mtime, self._swear_size):
+            return
+        self._swear_mtime, self._swear_size = st.st_mtime_ns, st.st_size
+
+        # compare raw-byte digests instead of parsing both files and
+        # deep-comparing the dicts; the JSON only gets parsed when
+        # the log really changed
+        digest   = _file_digest(filename)
+        lastfile = os.path.join(self.logger, "lastSwear.json")
+        if self._last_swear_digest is None:
+            try:
+                self._last_swear_digest = _file_digest(lastfile)
+            except FileNotFoundError:
+                self._last_swear_digest = b''
+
+        print("LOG: Comparing digests", digest.hex()[:12],
+              "|", self._last_swear_digest.hex()[:12] )
+        if digest != self._last_swear_digest:
+            # Not Identical, New json file. the baseline is kept as a
+            # byte-for-byte copy so its digest stays comparable.
+            data = log.read_json(filename)
+            shutil.copyfile(filename, lastfile)
+            self._last_swear_digest = digest
 
             swear_msg = log.generate_swear_log(data)
 
@@ -450,7 +931,7 @@ class TeqBot:
         """
 
         # temporary solution...
-        self.spawn_task("/usr/bin/git pull")
+        self.spawn_process("/usr/bin/git pull")
 
     def teq_message(self, message, channel, emoji):
         """Create a message, set post emoji, then post message to slack.
@@ -472,16 +953,28 @@ class TeqBot:
 
         """
         'set emoji and prepare a message, send'
-        self.set_emoji(emoji)
-        self.set_message(message)
-        self.set_channel(channel)
-        status, msg = self.send_message()
-        # reset the emoji to the standard robot face
-        self.set_emoji(ROBOT_EMOJI)
+        # pool tasks share this instance, so hold the lock across the
+        # setter sequence and the send; two overlapping tasks could
+        # otherwise interleave and post the wrong message/channel/
+        # emoji combination
+        with self._message_lock:
+            self.set_emoji(emoji)
+            self.set_message(message)
+            self.set_channel(channel)
+            status, msg = self.send_message()
+            # wait for the queued message to actually go out; tasks run
+            # as short-lived processes and would otherwise exit before
+            # the slack worker thread delivers it
+            slack.flush_messages()
+            # reset the emoji to the standard robot face
+            self.set_emoji(ROBOT_EMOJI)
         if status:
             print("Sent Message:", msg )
         else:
             print("Error: ", msg )
+            # the cached id may be stale (renamed/archived channel);
+            # drop it so the next post looks the name up again
+            self._channel_id_cache.pop(channel, None)
 
     def set_emoji(self, emojiName):
         """Set the emoji used to represent TeqBot on slack.
@@ -513,10 +1006,16 @@ class TeqBot:
 
         Note:
             The value set in TeqBot.channel is the channel's ID.
+            IDs are cached per name after the first lookup.
 
         """
         'set the channel id for TeqBot'
-        self.channel = slack.get_channel_id(self.slack, channel)
+        cid = self._channel_id_cache.get(channel)
+        if cid is None:
+            cid = slack.get_channel_id(self.slack, channel)
+            if cid is not None:
+                self._channel_id_cache[channel] = cid
+        self.channel = cid
 
     def set_last_song(self, song):
         """Set the last song played on the stream.
@@ -592,9 +1091,16 @@ class TeqBot:
         Note:
             This function relies on IceCast's metadata being
             updated on at least a mostly regular basis.
+            Results are cached for one second, so callers landing
+            back to back share a single HTTP round trip.
 
         """
-        ping, message = stream.ping_stream(self.stream)
+        now = time.monotonic()
+        cached_at, cached = self._np_cache
+        if cached is not None and now - cached_at < 1.0:
+            return cached
+        ping, message, listeners = stream.ping_stream(self.stream)
+        self._np_cache = (now, message)
         return message
 
     def get_profanity(self, filename="profanity.txt"):
@@ -609,9 +1115,18 @@ class TeqBot:
             This function relies on a "profanity.txt" file to be present
             in the directory set with the LOGGERPATH environment variable.
             a different filename can be provided if needed.
+            The loaded list is cached and only re-read when the file's
+            mtime changes.
         """
         filename = os.path.join(self.logger, filename)
-        return genius.load_profanity(filename)
+        st = os.stat(filename)
+        cached = self._profanity_cache.get(filename)
+        if cached is not None and cached[0] == st.st_mtime_ns:
+            return cached[1]
+        import genius  #lazy; only the lyrics path needs it
+        words = genius.load_profanity(filename)
+        self._profanity_cache[filename] = (st.st_mtime_ns, words)
+        return words
 
     def get_now_playing_logger(self, filename="nowPlaying.txt"):
         """Get the current song being played based on a nowplaying.txt file
@@ -627,10 +1142,23 @@ class TeqBot:
             This function relies on a "nowPlaying.txt" file to be present
             in the directory set with the LOGGERPATH environment variable.
             a different filename can be provided if needed.
+            Contents are cached and only re-read when the file's
+            mtime or size changes.
         """
         filename = os.path.join(self.logger, filename)
+        # the logger writes this file from another process, so a stat
+        # call decides whether the cached text is still current; an
+        # unchanged file skips the open/read/close entirely
+        st = os.stat(filename)
+        cached = self._np_logger_cache.get(filename)
+        if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+            return cached[1]
         with open(filename, 'r', newline='') as np:
-            return "".join(np.readlines())
+            # one read call; readlines() + join would allocate a list
+            # of every line just to glue them back together
+            contents = np.read()
+        self._np_logger_cache[filename] = ((st.st_mtime_ns, st.st_size), contents)
+        return contents
 
     def post_lyrics(self,lyrics,filename="lyrics.txt"):
         """Post Lyrics to a lyrics.txt file
@@ -669,7 +1197,7 @@ class TeqBot:
                     down, if it is.
 
         """
-        ping, message = stream.ping_stream(self.stream)
+        ping, message, listeners = stream.ping_stream(self.stream)
         return ping, message
 
     def compare_songs(self):
@@ -746,22 +1274,28 @@ class TeqBot:
             song (str): Song metadata to be posted in file.
 
         """
-        f = open('.teq.song', 'w')
-        f.write(song)
+        _atomic_write('.teq.song', song.encode('utf-8'))
+        self._last_song_cache = song
+        self.lastSong = song
 
     def get_last_played(self):
         """Read the teq song file to retrieve last song played.
 
         This method reads the metadata of a song from a hidden
         .teq.song file. This metadata is stored in the
-        TeqBot.lastSong variable.
+        TeqBot.lastSong variable. Once the value is known it is
+        served from memory; teqbot is the only writer of this file,
+        so the copy can't go stale.
 
         """
-        if os.path.exists('.teq.song'):
-            f = open('.teq.song', 'r')
-            self.lastSong = f.read()
+        if self._last_song_cache is not None:
+            self.lastSong = self._last_song_cache
         else:
-            self.lastSong = ""
+            try:
+                self.lastSong = _read_file('.teq.song').decode('utf-8')
+                self._last_song_cache = self.lastSong
+            except FileNotFoundError:
+                self.lastSong = ""
 
     def set_last_lyric(self, song):
         """Store the metadata for the last song lyric in a teq file
@@ -776,52 +1310,67 @@ class TeqBot:
             song (str): Song metadata to be posted in file.
 
         """
-        f = open('.teq.lyric', 'w')
-        f.write(song)
+        _atomic_write('.teq.lyric', song.encode('utf-8'))
+        self._last_lyric_cache = song
 
     def get_last_lyric(self):
         """Read the teq song lyric to retrieve last song played.
 
         This method reads the metadata of a song from a hidden
-        .teq.lyric file.
+        .teq.lyric file. As with get_last_played, the value is served
+        from memory once known; teqbot is the only writer.
 
         """
-        if os.path.exists('.teq.lyric'):
-            f = open('.teq.lyric', 'r')
-            return f.read()
-        else:
+        if self._last_lyric_cache is not None:
+            return self._last_lyric_cache
+        try:
+            self._last_lyric_cache = _read_file('.teq.lyric').decode('utf-8')
+        except FileNotFoundError:
             return ""
+        return self._last_lyric_cache
 
-    def check_last_played(self):
+    def check_last_played(self, check=None):
         """Check the teq song file to determine if a new song is being played.
 
         If the .teq.song file is present, read the file to determine what song
         is being played. Next, get the current playing song from the IceCast
         server. If the songs are not the same, then a new song is being played.
 
+        Args:
+            check (str): current song metadata, if the caller already
+                fetched it. Defaults to None, which pings the stream.
+
         Returns:
             bool: True if new song being played, False otherwise
 
         """
-        if os.path.exists('.teq.song'):
-            f = open('.teq.song', 'r')
+        # _read_file closes its descriptor before returning, so a busy
+        # poll loop can't pile up half-collected file objects, and the
+        # raw bytes compare without a utf-8 decode per poll
+        try:
+            song = _read_file('.teq.song')
+        except FileNotFoundError:
+            return False
+        if check is None:
             check = self.get_now_playing()
-            song = f.read()
-            if song == "None":
-                self.set_last_song( check )
-                self.set_last_played( check )
-                return True
-
-            elif check != song:
-                # New Song
-                self.set_last_song( check )
-                self.set_last_played( check )
-                return True
+        check_b = check.encode('utf-8')
+        check_h = hash(check_b)
+        # a hash mismatch against the recorded song proves a new song
+        # without walking both strings; the full compare only runs on
+        # a hash match (or a cold cache) to guard against collisions
+        if ( song == b"None"
+             or (self._last_check_hash is not None
+                 and check_h != self._last_check_hash)
+             or check_b != song ):
+            # new song (or the startup placeholder). set_last_played
+            # refreshes self.lastSong as well, which is all the old
+            # set_last_song call in each branch did.
+            self._last_check_hash = check_h
+            self.set_last_played( check )
+            return True
 
-            else:
-                return False
-        else:
-            return False
+        self._last_check_hash = check_h
+        return False
 
     def set_stat_file(self, status):
         """Set the value of the teq status file
@@ -839,8 +1388,8 @@ class TeqBot:
             status (str): Data to be written to .teq.stat file
 
         """
-        f = open('.teq.stat', 'w')
-        f.write(status)
+        _atomic_write('.teq.stat', status.encode('utf-8'))
+        self._stat_cache = (os.stat('.teq.stat').st_mtime_ns, status)
 
     def check_stat_file(self, check):
         """Check to see if the status file is a current value.
@@ -850,6 +1399,12 @@ class TeqBot:
         values are identical, this function returns true. If
         not, the stat file is not the same as the check parameter.
 
+        The file contents are only re-read when the mtime has moved
+        since the last look; an unchanged file costs one stat call
+        instead of an open/read/close. The mtime check matters
+        because the kill command writes 'Done' into this file from
+        another process.
+
         Args:
             check (str): Status being checked in the stat file.
 
@@ -857,12 +1412,16 @@ class TeqBot:
             bool: True if status of stat file is identical to check
                 variable, False otherwise or if stat file isn't present.
         """
-        if os.path.exists('.teq.stat'):
-            f = open('.teq.stat', 'r')
-            stat = f.read()
-            return check == stat
-        else:
+        try:
+            st = os.stat('.teq.stat')
+        except FileNotFoundError:
             return False
+        if self._stat_cache is not None and self._stat_cache[0] == st.st_mtime_ns:
+            stat = self._stat_cache[1]
+        else:
+            stat = _read_file('.teq.stat').decode('utf-8')
+            self._stat_cache = (st.st_mtime_ns, stat)
+        return check == stat
 
     def delete_stat_file(self):
         """Delete the status file.
@@ -876,8 +1435,13 @@ class TeqBot:
             present after the scheduler completes, the file
             should be manually removed.
         """
-        if os.path.exists('.teq.stat'):
+        # one syscall instead of an exists-then-remove pair, and no
+        # race window if the file disappears between the two
+        try:
             os.remove('.teq.stat')
+        except FileNotFoundError:
+            pass
+        self._stat_cache = None
 
     def tunein(self, metadata):
         """Post Metadata to TuneIn After Formatting.
@@ -897,7 +1461,42 @@ class TeqBot:
             is currently working, which are detailed in the
             tunein module of this project.
         """
-        tunein.post( self.tuneinStationID, self.tuneinPartnerID, self.tuneinPartnerKey, metadata)
+        if self._tunein_post is None:
+            import tunein  #lazy; only the metadata-post path needs it
+            # the credentials never change during a run, so bind them
+            # once instead of passing all three on every song change
+            self._tunein_post = functools.partial(
+                tunein.post, self.tuneinStationID,
+                self.tuneinPartnerID, self.tuneinPartnerKey)
+        self._tunein_post( metadata )
+
+    def parse_metadata(self, metadata):
+        """Parse metadata into display, song, and artist strings.
+
+        One pass over the metadata produces everything its consumers
+        want: the slack-facing display string and the song/artist
+        split used for lyric lookups. The old now_playing and
+        split_metadata helpers each scanned the metadata for the
+        separator on their own; both now delegate here.
+
+        Args:
+            metadata (str): Song metadata string containing
+                song name and artist name.
+
+        Returns:
+            (tuple): tuple containing:
+
+                display (str): metadata formatted for posting
+                song (str): Song Name.
+                artist (str): Artist Name.
+
+        """
+        song, sep, artist = metadata.partition(_SEP)
+        if not sep:
+            return metadata, song.strip(), ""
+        song   = song.strip()
+        artist = artist.strip()
+        return song + " by " + artist, song, artist
 
     def now_playing(self, metadata):
         """Clean Metadata for posting to slack.
@@ -909,51 +1508,33 @@ class TeqBot:
             don't seem to particularly care about this
             distinction.
         """
-        return metadata.replace("__by__", "by")
+        return self.parse_metadata(metadata)[0]
 
     def split_metadata(self, metadata):
         """Clean metadata into song and artist tuple
 
         """
-        # split the metadata at the correct position
-        split  = metadata.split("__by__", 1)
-        song   = split[0].rstrip().lstrip()
-
-        # check if artist and song were split
-        if len(split) > 1:
-            artist = split[1].rstrip().lstrip()
-        else:
-            artist = ""
-
-        return song,artist
+        display, song, artist = self.parse_metadata(metadata)
+        return song, artist
 
 if __name__ == "__main__":
-    teq = TeqBot()
+    try:
+        teq = TeqBot()
+    except RuntimeError as err:
+        # missing environment variables; the message names them
+        raise SystemExit(err)
 
     print("Hello! My name is", teq.username, "\n")
-    if os.environ.get('SLACK_TOKEN'):
-        print("Slack Token properly loaded")
-    else:
-        print("Slack Token not loaded!!")
-    if teq.stream:
-        print("Stream URL properly loaded")
-    else:
-        print("Stream URL not loaded!!")
-    if teq.python:
-        print("Python Path properly loaded")
-    else:
-        print("Python Path not loaded!!")
-    if teq.tuneinStationID:
-        print("TuneIn Station ID properly loaded")
-    else:
-        print("TuneIn Station ID not loaded!!")
-    if teq.tuneinPartnerID:
-        print("TuneIn Partner ID properly loaded")
-    else:
-        print("TuneIn Partner ID not loaded!!")
-    if teq.tuneinPartnerKey:
-        print("TuneIn Partner Key properly loaded")
-    else:
-        print("TuneIn Partner Key not loaded!!")
+    # one loop over the settings instead of six copy-pasted stanzas
+    for label, value in ( ("Slack Token",        os.environ.get('SLACK_TOKEN')),
+                          ("Stream URL",         teq.stream),
+                          ("Python Path",        teq.python),
+                          ("TuneIn Station ID",  teq.tuneinStationID),
+                          ("TuneIn Partner ID",  teq.tuneinPartnerID),
+                          ("TuneIn Partner Key", teq.tuneinPartnerKey) ):
+        if value:
+            print(label, "properly loaded")
+        else:
+            print(label, "not loaded!!")
 
     print("\nIt's nice to meet you!!")
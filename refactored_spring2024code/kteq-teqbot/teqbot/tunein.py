@@ -32,7 +32,28 @@ Todo:
 
 import requests
 import sys
-import urllib.parse
+
+#httpx provides the async client used by post_async, so a TuneIn
+#update can be in flight while the stream is being polled. the
+#synchronous path doesn't need it.
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+#shared HTTP session for the TuneIn AIR api. TuneIn gets an update
+#on every song change, so keeping the connection pooled avoids a
+#fresh handshake per post.
+_SESSION = requests.Session()
+_ADAPTER = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+_SESSION.mount('http://', _ADAPTER)
+_SESSION.mount('https://', _ADAPTER)
+
+#how long to wait before giving up on a TuneIn post
+TIMEOUT_VALUE = 30
+
+#endpoint for posting song updates
+TUNEIN_URL = "http://air.radiotime.com/Playing.ashx"
 
 def post(sID, pID, pKey, metadata):
     """Post song information to TuneIn.
@@ -72,30 +93,66 @@ def post(sID, pID, pKey, metadata):
         won't be entered on the DJ's end when recording
         songs on the station computer.
     """
+    params = _build_params(sID, pID, pKey, metadata)
+
+    #prints the HTTP request to terminal, sends out as HTTP GET request
+    print("Sending HTTP GET REQUEST:", TUNEIN_URL, params)
+    req = _SESSION.get(TUNEIN_URL, params=params, timeout=TIMEOUT_VALUE)
+
+def _build_params(sID, pID, pKey, metadata):
+    """Build the query parameters for a TuneIn song update.
+
+    Shared by the synchronous and asynchronous post paths; the http
+    client handles the url encoding in both cases.
+
+    Args:
+        sID (str): TuneIn Station ID
+        pID (str): TuneIn Partner ID
+        pKey (str): TuneIn Partner Key
+        metadata (str): Song metadata string containing
+            song name and artist name.
+
+    Returns:
+        (dict): query parameters for the Playing.ashx request
+    """
     #split metadata into song and artist info
     song, artist = parseMetadata(metadata)
 
-    #build the HTTP request
-    msg = "http://air.radiotime.com/Playing.ashx?partnerId=" + pID
-    msg = msg + "&partnerKey=" + pKey
-    msg = msg + "&id=" + sID
-    msg = msg + "&title="  + song
+    params = { 'partnerId'  : pID,
+               'partnerKey' : pKey,
+               'id'         : sID,
+               'title'      : song }
     if artist:
-        msg = msg + "&artist=" + artist
+        params['artist'] = artist
+    return params
 
-    #prints the HTTP request to terminal, sends out as HTTP GET request
-    print("Sending HTTP GET REQUEST:", msg)
-    req = requests.get(msg)
+async def post_async(client, sID, pID, pKey, metadata):
+    """Asynchronous variant of post.
+
+    Awaiting the request lets the TuneIn update overlap the stream
+    poll instead of blocking it.
+
+    Args:
+        client (httpx.AsyncClient): shared client, see
+            stream.make_async_client()
+        sID (str): TuneIn Station ID
+        pID (str): TuneIn Partner ID
+        pKey (str): TuneIn Partner Key
+        metadata (str): Song metadata string containing
+            song name and artist name.
+    """
+    params = _build_params(sID, pID, pKey, metadata)
+    print("Sending HTTP GET REQUEST:", TUNEIN_URL, params)
+    await client.get(TUNEIN_URL, params=params, timeout=TIMEOUT_VALUE)
 
 def parseMetadata(metadata):
     """Convert metadata string into formatted song and artist strings.
 
     This function takes a full metadata string and splits it into an
     artist string and a song string. This allows TuneIn's application
-    to distinguish the two fields for album art fetching. The function
-    also modifies the strings so that they are ready for the tunein.post()
-    function call, by replacing spaces with "+" symbols to work with
-    the HTTP GET request.
+    to distinguish the two fields for album art fetching. The strings
+    are returned raw; url encoding is left to the request itself so
+    nothing gets encoded twice.
 
     Args:
         metadata (str): Song metadata string containing
@@ -113,7 +170,7 @@ def parseMetadata(metadata):
         >>> metadata = "Square Peg Round Hole by WakeyWakey"
         >>> msg = tunein.parseMetadata(metadata)
         >>> msg
-        ('Square+Peg+Round+Hole', 'WakeyWakey')
+        ('Square Peg Round Hole', 'WakeyWakey')
 
     Todo:
         Will need to devise a more sophisticated method of
@@ -143,10 +200,6 @@ def parseMetadata(metadata):
     else:
         song = fullsong[0]
 
-    #clean up the song and artist strings
-    song   = urllib.parse.quote_plus(song)
-    artist = urllib.parse.quote_plus(artist)
-
     #return song and artist pair
     return song, artist
 
@@ -165,13 +218,12 @@ def usage():
         >>> msg
         '<tunein.py usage statement>'
     """
-    msg = "tunein.py usage:\n"
-    msg = msg + "$ python tunein.py \"<TUNEIN_STATION_ID>\" "
-    msg = msg + "\"<TUNEIN_PARTNER_ID>\" "
-    msg = msg + "\"<TUNEIN_PARTNER_KEY>\" "
-    msg = msg + "\"<SONG_NAME>\" "
-    msg = msg + "\"<SONG_ARTIST>\" "
-    return msg
+    return ( "tunein.py usage:\n"
+             "$ python tunein.py \"<TUNEIN_STATION_ID>\" "
+             "\"<TUNEIN_PARTNER_ID>\" "
+             "\"<TUNEIN_PARTNER_KEY>\" "
+             "\"<SONG_NAME>\" "
+             "\"<SONG_ARTIST>\" " )
 
 
 if __name__ == "__main__":